@@ -0,0 +1,71 @@
+"""
+shared_snippets - Process shared snippets in MTA documentation
+
+This package finds snippet files and can:
+1. List all snippet files and their usage
+2. Inline snippet content directly into including documents
+3. Validate that all snippets are properly referenced
+
+Adapted for MTA (Migration Toolkit for Applications) documentation structure.
+
+Snippet Identification:
+- Files with `:_mod-docs-content-type: SNIPPET` header
+- Files with `:_content-type: SNIPPET` header
+- Files with 'snippet' in the name (snippet_*, snippet-*, *-snippet.adoc)
+- Files in a `snippets/` subdirectory
+- Files starting with `// snippet` comment
+
+Command line: `python -m shared_snippets` or replace_shared_snippets.py.
+
+Library: load a tree once with DocCorpus and query it repeatedly; every
+method returns data and nothing is printed or logged at INFO level.
+
+    from shared_snippets import DocCorpus
+
+    docs = DocCorpus('mta-documentation')
+    for master in docs.affected(['docs/topics/snippets/tech-preview.adoc'])[0]:
+        ...
+
+The names below are imported on first access, so importing the package
+does not load the command-line interface or the modules a caller never uses.
+"""
+
+import importlib
+from typing import List
+
+_EXPORTS = {
+    'DocCorpus': 'api',
+    'Corpus': 'corpus',
+    'CorpusFile': 'corpus',
+    'IncludeDirective': 'corpus',
+    'scan_corpus': 'corpus',
+    'IncludeEdge': 'graph',
+    'IncludeGraph': 'graph',
+    'Variant': 'graph',
+    'VariantWalker': 'graph',
+    'build_include_graph': 'graph',
+    'find_affected_masters': 'graph',
+    'find_master_files': 'graph',
+    'select_variants': 'graph',
+    'Issue': 'validate',
+    'Validator': 'validate',
+    'Transaction': 'transaction',
+    'Flattener': 'flatten',
+    'flatten_guide': 'flatten',
+    'main': 'cli',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,9 @@
+"""
+Run the command-line interface: python -m shared_snippets.
+"""
+
+import sys
+
+from .cli import main
+
+sys.exit(main(prog='python -m shared_snippets'))
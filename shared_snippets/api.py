@@ -0,0 +1,169 @@
+"""
+Library entry point: a documentation tree loaded once and queried repeatedly.
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from .common import display_path
+from .corpus import Corpus, IncludeDirective, scan_corpus
+from .graph import (
+    IncludeEdge, IncludeGraph, VariantWalker, build_include_graph, find_affected_masters,
+    find_master_files, select_variants, snippet_usage,
+)
+from .validate import Issue, Validator
+from .watch import TreeWatcher, apply_file_change
+
+PathLike = Union[str, os.PathLike]
+
+
+class DocCorpus:
+    """
+    A documentation tree loaded once and queried repeatedly.
+
+    The corpus scan, the include graph, the evaluation of conditionals per
+    variant and the validation are each built on first use and kept, so a
+    tool that embeds this package pays for them once however many queries
+    it makes. Methods return data and never print. refresh() applies the
+    changes made on disk since, re-parsing only the files that changed.
+
+    Paths may be given absolute or relative to base_dir; they are resolved
+    through the symlinked topics/ and assemblies/ directories, and the
+    paths returned are resolved the same way (display_path() shows them
+    relative to base_dir).
+
+        docs = DocCorpus('mta-documentation', all_variants=True)
+        masters, _ = docs.affected(['docs/topics/snippets/tech-preview.adoc'])
+        errors = [issue for issue in docs.issues() if issue.severity == 'error']
+    """
+
+    def __init__(self, base_dir: PathLike = '.', use_cache: bool = True, jobs: int = 1,
+                 attributes: Optional[List[str]] = None, all_variants: bool = False):
+        self.base_dir = Path(base_dir).resolve()
+        self.use_cache = use_cache
+        self.jobs = jobs
+        self.attributes = attributes
+        self.all_variants = all_variants
+        self._corpus: Optional[Corpus] = None
+        self._graph: Optional[IncludeGraph] = None
+        self._validator: Optional[Validator] = None
+        self._watcher: Optional[TreeWatcher] = None
+        self._checked = False
+
+    @property
+    def corpus(self) -> Corpus:
+        """The scanned files, scanning the tree on first use."""
+        if self._corpus is None:
+            self._corpus = scan_corpus(self.base_dir, use_cache=self.use_cache, jobs=self.jobs)
+        return self._corpus
+
+    @property
+    def graph(self) -> IncludeGraph:
+        """The resolved include graph, built on first use."""
+        if self._graph is None:
+            self._graph = build_include_graph(self.corpus)
+        return self._graph
+
+    @property
+    def validator(self) -> Validator:
+        """The validator, which also holds the evaluated variants."""
+        if self._validator is None:
+            variants = select_variants(self.graph, self.attributes, self.all_variants)
+            self._validator = Validator(self.corpus, self.graph, variants)
+        return self._validator
+
+    @property
+    def walker(self) -> Optional[VariantWalker]:
+        """The variant walker, or None when no variants were selected."""
+        return self.validator.walker
+
+    def path(self, path: PathLike) -> Path:
+        """Resolve a path given absolute or relative to base_dir."""
+        return Path(os.path.realpath(self.base_dir / path))
+
+    def snippets(self) -> List[Path]:
+        """Return every snippet file, sorted by resolved path."""
+        return self.corpus.snippets()
+
+    def masters(self) -> Dict[str, Path]:
+        """Return {guide name: master.adoc path} for every guide."""
+        return find_master_files(self.corpus)
+
+    def usage(self, snippet: PathLike) -> List[Tuple[Path, str, int]]:
+        """Return the (including file, include line, line number) uses of a snippet."""
+        return snippet_usage(self.corpus, self.graph, self.path(snippet), set(self.snippets()),
+                             self.walker)
+
+    def includers(self, path: PathLike) -> List[IncludeEdge]:
+        """Return the includes of a file that some selected variant processes."""
+        walker = self.walker
+        return [edge for edge in self.graph.included_by(self.path(path))
+                if walker is None or walker.edge_mask(edge)]
+
+    def affected(self, changed: List[PathLike]) -> Tuple[Dict[Path, List[Path]], List[Path]]:
+        """
+        Return ({master: changed files that reach it}, changed files that
+        reach no master) for a list of changed or deleted files.
+        """
+        return find_affected_masters(self.graph, [self.path(path) for path in changed], self.walker)
+
+    def resolve_include(self, path: PathLike, line: Optional[int] = None,
+                        target: Optional[str] = None) -> Tuple[str, List[Tuple[Optional[Path], Optional[Path]]]]:
+        """
+        Resolve the include directive at a line of a file, or an include
+        target as if written in that file.
+
+        Returns the target as written and (master, resolved path) pairs:
+        one per guide when the target uses attributes, otherwise a single
+        (None, resolved path). Raises ValueError if there is nothing to
+        resolve.
+        """
+        resolved = self.path(path)
+        entry = self.corpus.get(resolved)
+        if entry is None:
+            raise ValueError(f"Not in the documentation tree: {path}")
+        if line is not None:
+            edges = [edge for edge in self.graph.includes_of(resolved) if edge.directive.line_number == line]
+            if not edges:
+                raise ValueError(f"No include directive at {path}:{line}")
+            edge = edges[0]
+        elif target:
+            edge = IncludeEdge(resolved, IncludeDirective(target, '', 0, ''), self.graph.resolve(entry, target))
+        else:
+            raise ValueError("Give the line of an include directive or a target")
+        return edge.directive.target, self.graph.resolve_for_masters(edge)
+
+    def exists(self, path: Path) -> bool:
+        """Check whether a resolved path is a scanned file or exists on disk."""
+        return path in self.corpus or path.exists()
+
+    def issues(self, path: Optional[PathLike] = None) -> List[Issue]:
+        """
+        Return the errors and then the warnings of the whole tree, or only
+        those located in one file. Validation runs on first use and is
+        kept up to date by refresh().
+        """
+        if not self._checked:
+            self.validator.check_all()
+            self._checked = True
+        issues = self.validator.errors() + self.validator.warnings()
+        if path is None:
+            return issues
+        rel_path = str(display_path(self.path(path), self.base_dir))
+        return [issue for issue in issues if issue.path == rel_path]
+
+    def refresh(self) -> List[Path]:
+        """
+        Re-parse the files changed, added or deleted since the tree was
+        loaded or last refreshed, and update the graph and validation.
+        Returns the resolved paths that changed.
+        """
+        if self._corpus is None:
+            return []
+        if self._watcher is None:
+            self._watcher = TreeWatcher(self.corpus)
+        changed = self._watcher.poll()
+        for path in changed:
+            apply_file_change(self.corpus, self.graph, self.validator, path)
+        return changed
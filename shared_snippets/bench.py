@@ -0,0 +1,306 @@
+"""
+Benchmarks on synthetic documentation corpora.
+"""
+
+import os
+import random
+import re
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+from .common import (
+    DEFAULT_ASSEMBLIES_DIR, DEFAULT_ATTRIBUTES_FILE, DEFAULT_DOCS_DIR, DEFAULT_TOPICS_DIR,
+    MASTER_FILENAME, PROFILER, read_text,
+)
+from .corpus import (
+    Corpus, extract_includes, has_snippet_header, scan_adoc_content, scan_corpus,
+)
+from .graph import build_include_graph, find_snippet_usage
+from .validate import Validator
+from .inline import (
+    adjust_heading_levels, apply_inline_plan, apply_leveloffset, build_inline_plan,
+    replace_include_lines,
+)
+
+
+def generate_synthetic_corpus(root: Path, modules: int = 1000, snippets: int = 50,
+                              includes_per_module: int = 3, guides: int = 4,
+                              modules_per_assembly: int = 20, seed: int = 0) -> int:
+    """
+    Generate a documentation tree laid out like this repository.
+
+    The tree has docs/<guide>/master.adoc files with symlinked topics/ and
+    assemblies/ directories, assemblies/<guide>/ with symlinked topics/,
+    a top-level topics symlink, modules under docs/topics/ that include
+    snippets with leveloffset options, and snippet files under
+    docs/topics/snippets/.
+
+    Returns the number of .adoc files written.
+    """
+    rng = random.Random(seed)
+    docs_dir = root / DEFAULT_DOCS_DIR
+    topics_dir = root / DEFAULT_TOPICS_DIR
+    assemblies_dir = root / DEFAULT_ASSEMBLIES_DIR
+    written = 0
+
+    def write(path: Path, content: str) -> None:
+        nonlocal written
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding='utf-8')
+        written += 1
+
+    def link(path: Path, target: str) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.symlink(target, path, target_is_directory=True)
+
+    write(root / DEFAULT_ATTRIBUTES_FILE,
+          ':imagesdir: topics/images\n:topicsdir: topics\n\n'
+          ':_mod-docs-content-type: ATTRIBUTES\n'
+          'ifdef::mta[]\n:ProductName: migration toolkit for applications\nendif::[]\n')
+
+    for i in range(snippets):
+        write(topics_dir / 'snippets' / f'snippet-{i:05d}.adoc',
+              f':_mod-docs-content-type: SNIPPET\n\n'
+              f'= Shared content {i}\n\n'
+              f'This paragraph is shared between modules (snippet {i}).\n\n'
+              f'== Details {i}\n\n* First point\n* Second point\n')
+
+    areas = max(1, modules // 200)
+    module_paths = []
+    for i in range(modules):
+        area = f'area-{i % areas:03d}'
+        body = [
+            ':_mod-docs-content-type: PROCEDURE',
+            f'[id="module-{i}_{{context}}"]',
+            f'= Module {i}',
+            '',
+            f'Introductory text for module {i}. ' * 4,
+            '',
+        ]
+        for _ in range(includes_per_module if snippets else 0):
+            level = rng.choice(('[leveloffset=+1]', '[leveloffset=+2]', '[]'))
+            body.append(f'include::../snippets/snippet-{rng.randrange(snippets):05d}.adoc{level}')
+            body.append('')
+        body.append('.Procedure\n\n. Do the first step.\n. Do the second step.')
+        write(topics_dir / area / f'proc_module-{i:06d}.adoc', '\n'.join(body) + '\n')
+        module_paths.append(f'{area}/proc_module-{i:06d}.adoc')
+
+    guide_names = [f'guide-{g:02d}' for g in range(guides)]
+    guide_assemblies: Dict[str, List[str]] = {name: [] for name in guide_names}
+    for a, start in enumerate(range(0, modules, modules_per_assembly)):
+        guide = guide_names[a % guides]
+        name = f'assembly_{a:05d}.adoc'
+        lines = [':_mod-docs-content-type: ASSEMBLY', f'= Assembly {a}', '']
+        for module in module_paths[start:start + modules_per_assembly]:
+            lines.append(f'include::topics/{module}[leveloffset=+1]')
+            lines.append('')
+        write(assemblies_dir / guide / name, '\n'.join(lines))
+        guide_assemblies[guide].append(name)
+
+    link(root / 'topics', 'docs/topics/')
+    for guide in guide_names:
+        link(assemblies_dir / guide / 'topics', '../../topics/')
+        link(docs_dir / guide / 'topics', '../topics/')
+        link(docs_dir / guide / 'assemblies', '../../assemblies/')
+        lines = [':mta:', f':context: {guide}', 'include::topics/templates/document-attributes.adoc[]',
+                 '', f'[id="{guide}"]', f'= Guide {guide}', '']
+        for name in guide_assemblies[guide]:
+            lines.append(f'include::assemblies/{guide}/{name}[leveloffset=+1]')
+            lines.append('')
+        write(docs_dir / guide / MASTER_FILENAME, '\n'.join(lines))
+
+    return written
+
+
+def peak_rss_mib() -> Optional[float]:
+    """
+    Return the peak resident set size of this process in MiB, if known.
+
+    This is a high-water mark for the whole process so far, not the
+    memory a single phase used.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+@dataclass
+class PhaseResult:
+    """Measurements for one benchmark phase."""
+    name: str
+    seconds: float
+    files_read: int = 0
+    bytes_read: int = 0
+    peak_rss_mib: Optional[float] = None
+
+    def record(self) -> dict:
+        return {
+            'type': 'phase',
+            'phase': self.name,
+            'seconds': round(self.seconds, 6),
+            'files_read': self.files_read,
+            'bytes_read': self.bytes_read,
+            'peak_rss_mib': round(self.peak_rss_mib, 1) if self.peak_rss_mib is not None else None,
+        }
+
+
+def run_phase(name: str, func: Callable[[], object]) -> Tuple[object, PhaseResult]:
+    """
+    Run one benchmark phase, counting the files and bytes it reads with
+    the profiler's counters before and after.
+    """
+    reads, bytes_read = PROFILER.reads, PROFILER.bytes_read
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    return result, PhaseResult(name, elapsed, PROFILER.reads - reads, PROFILER.bytes_read - bytes_read,
+                               peak_rss_mib())
+
+
+def run_benchmark(root: Path, jobs: int = 1) -> List[PhaseResult]:
+    """Run every phase of the snippet pipeline against the tree at root."""
+    phases = []
+
+    def scan(use_cache: bool) -> Callable[[], Corpus]:
+        return lambda: scan_corpus(root, use_cache=use_cache, jobs=jobs)
+
+    _, result = run_phase('scan (no cache)', scan(False))
+    phases.append(result)
+    _, result = run_phase('scan (cold cache)', scan(True))
+    phases.append(result)
+    corpus, result = run_phase('scan (warm cache)', scan(True))
+    phases.append(result)
+
+    graph, result = run_phase('include graph', lambda: build_include_graph(corpus))
+    phases.append(result)
+
+    snippets = corpus.snippets()
+    usage, result = run_phase(
+        'snippet usage',
+        lambda: find_snippet_usage(root, snippets, corpus=corpus, graph=graph))
+    phases.append(result)
+
+    _, result = run_phase('validate', lambda: Validator(corpus, graph).check_all())
+    phases.append(result)
+
+    def inline():
+        plan = build_inline_plan(snippets, usage, graph=graph)
+        apply_inline_plan(plan)
+        return plan
+
+    _, result = run_phase('inline', inline)
+    phases.append(result)
+    return phases
+
+
+def run_matcher_benchmark(root: Path, repeat: int = 5) -> List[Tuple[str, float, float]]:
+    """
+    Time the per-pattern matching the tool used to do against what it
+    does now, on the files of the tree at root.
+
+    Returns (name, per-pattern seconds, current seconds) for snippet and
+    include detection (separate patterns against the combined SCAN_RE)
+    and for replacing includes in memory (a regex compiled per snippet
+    and file against replace_include_lines() on the include graph's
+    line numbers).
+    """
+    corpus = scan_corpus(root)
+    contents = [read_text(path) for path in corpus.files]
+    snippets = corpus.snippets()
+    graph = build_include_graph(corpus)
+    usage = find_snippet_usage(root, snippets, corpus=corpus, graph=graph)
+    plan = build_inline_plan(snippets, usage, graph=graph)
+    including = [(path, read_text(path), replacements) for path, replacements in plan.items()]
+
+    def best_of(func: Callable[[], object]) -> float:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def detect_per_pattern():
+        for content in contents:
+            has_snippet_header(content)
+            extract_includes(content)
+
+    def detect_combined():
+        for content in contents:
+            scan_adoc_content(content)
+
+    def inline_per_pattern():
+        for _, content, replacements in including:
+            for snippet, _, snippet_content, _ in {r[0]: r for r in replacements.values()}.values():
+                pattern = re.compile(rf'^include::([^\[]*{re.escape(snippet.name)})\[(.*?)\]', re.MULTILINE)
+                content = pattern.sub(lambda m: apply_leveloffset(snippet_content, m.group(2)), content)
+
+    def inline_by_line():
+        for path, content, replacements in including:
+            replace_include_lines(content, replacements, path)
+
+    results = [('detect headers + includes', best_of(detect_per_pattern), best_of(detect_combined))]
+    if including:
+        results.append(('replace includes', best_of(inline_per_pattern), best_of(inline_by_line)))
+    return results
+
+
+def synthetic_heading_document(lines: int) -> str:
+    """Return roughly `lines` lines of AsciiDoc mixing titles with every kind of block."""
+    chunk = [
+        '== Section',
+        '',
+        'Paragraph text with a {ProductShortName} attribute.',
+        '',
+        '[source,terminal]',
+        '----',
+        '= not a title inside a listing',
+        '----',
+        '',
+        '.Example',
+        '====',
+        '=== Discrete heading in an example',
+        '----',
+        '== nested listing',
+        '----',
+        '====',
+        '',
+        '// = a comment',
+        '////',
+        '= inside a comment block',
+        '////',
+        '',
+    ]
+    return '\n'.join(chunk * max(1, lines // len(chunk)))
+
+
+def run_heading_benchmark(sizes: Tuple[int, ...] = (10_000, 20_000, 40_000, 80_000, 160_000),
+                          repeat: int = 3) -> List[Tuple[int, float]]:
+    """
+    Time adjust_heading_levels() on synthetic documents of growing size.
+
+    Returns (lines, best seconds) per size; a constant time per line shows
+    that the tokenizer stays linear.
+    """
+    results = []
+    for size in sizes:
+        content = synthetic_heading_document(size)
+        line_count = content.count('\n') + 1
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            adjust_heading_levels(content, -1)
+            adjust_heading_levels(content, 2)
+            timings.append((time.perf_counter() - start) / 2)
+        results.append((line_count, min(timings)))
+    return results
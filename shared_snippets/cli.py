@@ -0,0 +1,1220 @@
+"""
+Command-line interface: argument parsing and the subcommand handlers.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional
+
+from .common import (
+    CACHE_DIR, DEFAULT_DOCS_DIR, DEFAULT_FLATTEN_DIR, DEFAULT_SNIPPETS_DIR, DEFAULT_SOCKET,
+    JOURNAL_DIR, MASTER_FILENAME, OUTPUT_FORMATS, PROFILER, SKIP_DIRS_SET, display_path,
+    git_changed_files,
+)
+from .corpus import Corpus, find_snippet_files, iter_scan_corpus, scan_corpus
+
+if TYPE_CHECKING:
+    from .api import DocCorpus
+    from .graph import IncludeGraph, Variant
+
+log = logging.getLogger(__name__)
+
+
+def scan_options(args) -> dict:
+    """Return the scan_corpus keyword arguments for the global command-line options."""
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    return {'use_cache': not args.no_cache, 'jobs': jobs}
+
+
+def load_corpus(base_dir: Path, args) -> Corpus:
+    """Scan the corpus using the global command-line options."""
+    return scan_corpus(base_dir, **scan_options(args))
+
+
+def load_variants(args, graph: 'IncludeGraph') -> Optional[List['Variant']]:
+    """Return the variants selected with --attribute or --all-variants, if any."""
+    from .graph import select_variants
+    return select_variants(graph, args.attribute, args.all_variants)
+
+
+def load_doc_corpus(base_dir: Path, args) -> 'DocCorpus':
+    """Return a DocCorpus set up from the global command-line options."""
+    from .api import DocCorpus
+    return DocCorpus(base_dir, attributes=args.attribute, all_variants=args.all_variants,
+                     **scan_options(args))
+
+
+def list_snippets_command(args):
+    """Handle the 'list' subcommand."""
+    from .graph import VariantWalker, build_include_graph, find_snippet_usage
+    from .records import RecordWriter, iter_list_records, snippet_record
+    
+    base_dir = Path(args.base_dir).resolve()
+    
+    if not base_dir.exists():
+        log.error(f"Base directory not found: {base_dir}")
+        return 1
+    
+    if args.format != 'text':
+        writer = RecordWriter(args.format)
+        corpus = Corpus(base_dir)
+        if args.format == 'ndjson' and not (args.show_usage or args.show_masters):
+            # Stream snippets straight out of the scan, in scan order
+            for entry in iter_scan_corpus(corpus, **scan_options(args)):
+                if entry.is_snippet:
+                    writer.write(snippet_record(entry, base_dir))
+        else:
+            for _ in iter_scan_corpus(corpus, **scan_options(args)):
+                pass
+            graph = build_include_graph(corpus) if args.show_usage or args.show_masters else None
+            variants = load_variants(args, graph) if graph is not None else None
+            walker = VariantWalker(graph, variants).walk_all() if variants else None
+            for record in iter_list_records(corpus, corpus.snippets(), graph, args.show_masters, walker):
+                writer.write(record)
+        writer.close()
+        return 0
+    
+    corpus = load_corpus(base_dir, args)
+    snippets = find_snippet_files(base_dir, corpus=corpus)
+    
+    if not snippets:
+        log.info("No snippet files found.")
+        return 0
+    
+    print(f"\nFound {len(snippets)} snippet file(s):\n")
+    
+    if args.show_usage or args.show_masters:
+        graph = build_include_graph(corpus)
+        variants = load_variants(args, graph)
+        walker = VariantWalker(graph, variants).walk_all() if variants else None
+        usage = find_snippet_usage(base_dir, snippets, corpus=corpus, graph=graph, walker=walker)
+        for snippet in snippets:
+            uses = usage[snippet]
+            try:
+                relative_path = snippet.relative_to(base_dir)
+            except ValueError:
+                relative_path = snippet
+            
+            # Determine how the snippet was identified
+            identification = corpus.files[snippet].snippet_reasons
+            
+            id_str = f" [{', '.join(identification)}]" if identification else ""
+            print(f"  {relative_path}{id_str}")
+            
+            if uses:
+                print(f"    Used in {len(uses)} location(s):")
+                for including_file, include_line, line_num in uses:
+                    try:
+                        rel_inc = including_file.relative_to(base_dir)
+                    except ValueError:
+                        rel_inc = including_file
+                    only = ""
+                    if walker is not None:
+                        mask = walker.edge_masks[(including_file, line_num)]
+                        if mask != walker.all_variants:
+                            only = f" [{', '.join(walker.names(mask))}]"
+                    print(f"      - {rel_inc}:{line_num}{only}")
+            else:
+                print("    ⚠ Not used in any files")
+            
+            if args.show_masters:
+                masters = graph.masters_including(snippet)
+                print(f"    Pulled into {len(masters)} guide(s):")
+                for master in masters:
+                    print(f"      - {display_path(master, base_dir)}")
+            print()
+    else:
+        for snippet in snippets:
+            try:
+                relative_path = snippet.relative_to(base_dir)
+            except ValueError:
+                relative_path = snippet
+            print(f"  {relative_path}")
+    
+    return 0
+
+
+def rollback_inline(base_dir: Path) -> int:
+    """Undo the last committed (or interrupted) inline transaction."""
+    from .transaction import Transaction
+    
+    transaction = Transaction.latest(base_dir)
+    if transaction is None:
+        log.error(f"Nothing to roll back: no journal in {base_dir / JOURNAL_DIR}")
+        return 1
+    
+    modified = transaction.modified_since_commit()
+    if modified:
+        for path in modified:
+            log.error(f"Changed since inline {transaction.id}: {display_path(path, base_dir)}")
+        log.error("Not rolling back; restore or commit these files first")
+        return 1
+    
+    restored = transaction.rollback()
+    print(f"\nRolled back inline {transaction.id}: restored {restored} file(s)")
+    return 0
+
+
+def inline_command(args):
+    """Handle the 'inline' subcommand."""
+    from .graph import build_include_graph, find_snippet_usage
+    from .inline import apply_inline_plan, build_inline_plan
+    from .transaction import Transaction
+    
+    base_dir = Path(args.base_dir).resolve()
+    
+    if not base_dir.exists():
+        log.error(f"Base directory not found: {base_dir}")
+        return 1
+    
+    if args.rollback:
+        return rollback_inline(base_dir)
+    
+    pending = Transaction.latest(base_dir)
+    if pending is not None and pending.state == 'prepared':
+        log.error(f"Inline {pending.id} was interrupted; run 'inline --rollback' first")
+        return 1
+    
+    corpus = load_corpus(base_dir, args)
+    snippets = find_snippet_files(base_dir, corpus=corpus)
+    
+    if not snippets:
+        log.info("No snippet files found.")
+        return 0
+    
+    graph = build_include_graph(corpus)
+    usage = find_snippet_usage(base_dir, snippets, corpus=corpus, graph=graph)
+    
+    # Filter to specific snippet if provided
+    if args.snippet:
+        target_snippets = [s for s in snippets if args.snippet in s.name]
+        if not target_snippets:
+            log.error(f"Snippet not found: {args.snippet}")
+            return 1
+    else:
+        target_snippets = snippets
+    
+    plan = build_inline_plan(target_snippets, usage, strip_headers=not args.keep_headers, graph=graph)
+    
+    if args.dry_run:
+        replaced_count = apply_inline_plan(plan, dry_run=True)
+        print(f"\nWould replace {replaced_count} include(s)")
+        return 0
+    
+    # Stage every rewrite and deletion, then apply them together
+    transaction = Transaction(base_dir)
+    try:
+        replaced_count = apply_inline_plan(plan, transaction=transaction)
+    except OSError as e:
+        transaction.discard()
+        log.error(f"Inline failed while staging; nothing was changed: {e}")
+        return 1
+    deleted = []
+    if args.delete_snippets:
+        deleted = [snippet for snippet in target_snippets if usage[snippet]]  # Only delete if it was used
+        for snippet in deleted:
+            transaction.delete(snippet)
+    
+    if transaction.operations:
+        try:
+            transaction.commit()
+        except OSError as e:
+            log.error(f"Inline failed and was rolled back: {e}")
+            return 1
+    
+    print(f"\nReplaced {replaced_count} include(s)")
+    for snippet in deleted:
+        log.info(f"Deleted snippet file: {snippet}")
+    if args.delete_snippets:
+        print(f"Deleted {len(deleted)} snippet file(s)")
+    if transaction.operations:
+        print(f"Undo with: inline --rollback (journal {JOURNAL_DIR}/{transaction.id})")
+    
+    return 0
+
+
+def validate_command(args):
+    """Handle the 'validate' subcommand."""
+    from .graph import build_include_graph
+    from .records import RecordWriter
+    from .validate import Validator
+    
+    base_dir = Path(args.base_dir).resolve()
+    
+    if not base_dir.exists():
+        log.error(f"Base directory not found: {base_dir}")
+        return 1
+    
+    corpus = load_corpus(base_dir, args)
+    graph = build_include_graph(corpus)
+    snippets = find_snippet_files(base_dir, corpus=corpus)
+    validator = Validator(corpus, graph, load_variants(args, graph))
+    
+    if args.changed_since:
+        changed = git_changed_files(base_dir, args.changed_since)
+        if changed is None:
+            return 1
+        changed = [path for path in changed if path.suffix == '.adoc' and
+                   not SKIP_DIRS_SET.intersection(display_path(path, base_dir).parts)]
+        issues = validator.iter_check_changed(changed)
+    else:
+        issues = validator.iter_check_all()
+    
+    if args.format != 'text':
+        writer = RecordWriter(args.format)
+        error_count = warning_count = 0
+        for issue in issues:
+            writer.write(issue.record())
+            if issue.severity == 'error':
+                error_count += 1
+            else:
+                warning_count += 1
+        summary = {
+            'type': 'summary',
+            'snippets': len(snippets),
+            'errors': error_count,
+            'warnings': warning_count,
+        }
+        if args.changed_since:
+            summary['changed'] = len(changed)
+        writer.write(summary)
+        writer.close()
+        return 1 if error_count else 0
+    
+    issues = list(issues)
+    errors = [issue.message for issue in issues if issue.severity == 'error']
+    warnings = [issue.message for issue in issues if issue.severity != 'error']
+    
+    # Print results
+    print(f"\nValidation Results for {base_dir}:")
+    if args.changed_since:
+        print(f"  Files changed since {args.changed_since}: {len(changed)}")
+    print(f"  Snippets found: {len(snippets)}")
+    print(f"  Errors: {len(errors)}")
+    print(f"  Warnings: {len(warnings)}")
+    
+    if errors:
+        print("\nErrors:")
+        for error in errors:
+            print(f"  ❌ {error}")
+    
+    if warnings:
+        print("\nWarnings:")
+        for warning in warnings:
+            print(f"  ⚠ {warning}")
+    
+    if not errors and not warnings:
+        print("\n✅ All snippets are valid and in use.")
+    
+    return 1 if errors else 0
+
+
+def affected_command(args):
+    """Handle the 'affected' subcommand - list the guides to rebuild after changes."""
+    from .records import RecordWriter
+    
+    base_dir = Path(args.base_dir).resolve()
+    
+    if not base_dir.exists():
+        log.error(f"Base directory not found: {base_dir}")
+        return 1
+    
+    if args.changed_since:
+        changed = git_changed_files(base_dir, args.changed_since)
+        if changed is None:
+            return 1
+    elif args.files:
+        names: List[str] = []
+        for name in args.files:
+            if name == '-':
+                names.extend(line.strip() for line in sys.stdin if line.strip())
+            else:
+                names.append(name)
+        changed = [Path(os.path.realpath(base_dir / name)) for name in dict.fromkeys(names)]
+    else:
+        log.error("Give the changed files, '-' to read them from stdin, or --changed-since REF")
+        return 1
+    
+    docs = load_doc_corpus(base_dir, args)
+    affected, unreferenced = docs.affected(changed)
+    
+    for path in unreferenced:
+        log.debug(f"Not included by any guide: {display_path(path, base_dir)}")
+    
+    if args.format != 'text':
+        writer = RecordWriter(args.format)
+        for master, paths in affected.items():
+            writer.write({
+                'type': 'master',
+                'guide': master.parent.name,
+                'master': str(display_path(master, base_dir)),
+                'changed': [str(display_path(path, base_dir)) for path in paths],
+            })
+        writer.write({
+            'type': 'summary',
+            'changed': len(changed),
+            'affected': len(affected),
+            'guides': len(docs.masters()),
+            'unreferenced': [str(display_path(path, base_dir)) for path in unreferenced],
+        })
+        writer.close()
+        return 0
+    
+    # One master per line, ready for xargs or a build matrix
+    for master in affected:
+        print(display_path(master, base_dir))
+    
+    return 0
+
+
+def watch_command(args):
+    """Handle the 'watch' subcommand - revalidate as files change."""
+    from .graph import build_include_graph
+    from .validate import Issue, Validator
+    from .watch import TreeWatcher, apply_file_change
+    
+    base_dir = Path(args.base_dir).resolve()
+    
+    if not base_dir.exists():
+        log.error(f"Base directory not found: {base_dir}")
+        return 1
+    
+    corpus = load_corpus(base_dir, args)
+    graph = build_include_graph(corpus)
+    validator = Validator(corpus, graph, load_variants(args, graph))
+    validator.check_all()
+    watcher = TreeWatcher(corpus)
+    
+    errors = set(validator.errors())
+    warnings = set(validator.warnings())
+    print(f"\nWatching {base_dir} ({len(corpus.files)} files, "
+          f"{len(errors)} error(s), {len(warnings)} warning(s)). Press Ctrl+C to stop.")
+    for error in validator.errors():
+        print(f"  ❌ {error.message}")
+    for warning in validator.warnings():
+        print(f"  ⚠ {warning.message}")
+    
+    def by_message(issue: Issue) -> str:
+        return issue.message
+    
+    try:
+        while True:
+            time.sleep(args.interval)
+            changed = watcher.poll()
+            if not changed:
+                continue
+            
+            start = time.perf_counter()
+            for path in changed:
+                apply_file_change(corpus, graph, validator, path)
+            new_errors = set(validator.errors())
+            new_warnings = set(validator.warnings())
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            
+            names = ', '.join(str(display_path(path, base_dir)) for path in changed)
+            print(f"\n[{time.strftime('%H:%M:%S')}] {names} ({elapsed_ms:.0f} ms)")
+            for error in sorted(new_errors - errors, key=by_message):
+                print(f"  + ❌ {error.message}")
+            for error in sorted(errors - new_errors, key=by_message):
+                print(f"  - ❌ {error.message}")
+            for warning in sorted(new_warnings - warnings, key=by_message):
+                print(f"  + ⚠ {warning.message}")
+            for warning in sorted(warnings - new_warnings, key=by_message):
+                print(f"  - ⚠ {warning.message}")
+            if new_errors == errors and new_warnings == warnings:
+                print("  No change in errors or warnings")
+            errors, warnings = new_errors, new_warnings
+    except KeyboardInterrupt:
+        print()
+        return 0
+
+
+def serve_command(args):
+    """Handle the 'serve' subcommand - answer queries over a Unix domain socket."""
+    import signal
+    import socket
+    from .serve import QueryService, serve_queries
+    
+    base_dir = Path(args.base_dir).resolve()
+    
+    if not base_dir.exists():
+        log.error(f"Base directory not found: {base_dir}")
+        return 1
+    
+    if not hasattr(socket, 'AF_UNIX'):
+        log.error("Unix domain sockets are not available on this platform")
+        return 1
+    
+    socket_path = Path(args.socket)
+    if not socket_path.is_absolute():
+        socket_path = base_dir / socket_path
+    if socket_path.exists():
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(str(socket_path))
+        except OSError:
+            socket_path.unlink()  # Left behind by a server that did not exit cleanly
+        else:
+            log.error(f"Another server is already listening on {socket_path}")
+            return 1
+        finally:
+            probe.close()
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+    
+    docs = load_doc_corpus(base_dir, args)
+    docs.issues()  # Validate up front so the first query is fast
+    service = QueryService(docs)
+    
+    log.info(f"Serving {base_dir} ({len(docs.corpus.files)} files) on {socket_path}. Press Ctrl+C to stop.")
+    # Stop cleanly, removing the socket, when an editor or service manager terminates us
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        serve_queries(service, socket_path, args.interval)
+    except KeyboardInterrupt:
+        print()
+    except OSError as e:
+        log.error(f"Could not serve on {socket_path}: {e}")
+        return 1
+    return 0
+
+
+def bench_command(args):
+    """Handle the 'bench' subcommand - benchmark against a synthetic corpus."""
+    import tempfile
+    from .bench import (
+        generate_synthetic_corpus, run_benchmark, run_heading_benchmark, run_matcher_benchmark,
+        run_phase,
+    )
+    from .records import RecordWriter
+    
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    if not args.verbose:
+        # Per-file inline messages would drown the report
+        logging.getLogger(__package__).setLevel(logging.WARNING)
+    
+    if args.headings:
+        sizes = run_heading_benchmark()
+        if args.format != 'text':
+            writer = RecordWriter(args.format)
+            for lines, seconds in sizes:
+                writer.write({'type': 'headings', 'lines': lines, 'seconds': round(seconds, 6),
+                              'microseconds_per_line': round(seconds / lines * 1e6, 3)})
+            writer.close()
+            return 0
+        print(f"\n  {'Lines':>10} {'Time (s)':>10} {'us/line':>9}")
+        for lines, seconds in sizes:
+            print(f"  {lines:>10} {seconds:>10.4f} {seconds / lines * 1e6:>9.3f}")
+        return 0
+    
+    if args.output:
+        root = Path(args.output).resolve()
+        if root.exists() and any(root.iterdir()):
+            log.error(f"Output directory is not empty: {root}")
+            return 1
+        root.mkdir(parents=True, exist_ok=True)
+        temp_dir = None
+    else:
+        temp_dir = tempfile.TemporaryDirectory(prefix='snippet-bench-')
+        root = Path(temp_dir.name).resolve()
+    
+    try:
+        written, generate = run_phase('generate', lambda: generate_synthetic_corpus(
+            root, modules=args.files, snippets=args.snippets, includes_per_module=args.includes,
+            guides=args.guides, seed=args.seed))
+        if args.micro:
+            matchers = run_matcher_benchmark(root)
+        else:
+            phases = [generate] + run_benchmark(root, jobs=jobs)
+    finally:
+        if temp_dir is not None:
+            temp_dir.cleanup()
+    
+    if args.format != 'text':
+        writer = RecordWriter(args.format)
+        writer.write({'type': 'corpus', 'files': written, 'snippets': args.snippets,
+                      'includes_per_module': args.includes, 'guides': args.guides, 'jobs': jobs})
+        if args.micro:
+            for name, baseline, current in matchers:
+                writer.write({'type': 'matcher', 'name': name, 'per_pattern_seconds': round(baseline, 6),
+                              'current_seconds': round(current, 6)})
+        else:
+            for phase in phases:
+                writer.write(phase.record())
+        writer.close()
+        return 0
+    
+    if args.micro:
+        print(f"\nSynthetic corpus: {written} files, {args.snippets} snippets\n")
+        print(f"  {'Matcher':<28} {'Per-pattern (s)':>16} {'Current (s)':>14} {'Speedup':>9}")
+        for name, baseline, current in matchers:
+            speedup = baseline / current if current else float('inf')
+            print(f"  {name:<28} {baseline:>16.4f} {current:>14.4f} {speedup:>8.1f}x")
+        return 0
+    
+    print(f"\nSynthetic corpus: {written} files, {args.snippets} snippets, "
+          f"{args.includes} include(s) per module, {args.guides} guides, {jobs} job(s)\n")
+    print(f"  {'Phase':<20} {'Wall (s)':>10} {'Files read':>12} {'Bytes read':>14} {'Peak RSS so far (MiB)':>22}")
+    for phase in phases:
+        rss = f"{phase.peak_rss_mib:.1f}" if phase.peak_rss_mib is not None else "n/a"
+        print(f"  {phase.name:<20} {phase.seconds:>10.3f} {phase.files_read:>12} "
+              f"{phase.bytes_read:>14} {rss:>22}")
+    if args.output:
+        print(f"\nCorpus kept in {root}")
+    
+    return 0
+
+
+def show_command(args):
+    """Handle the 'show' subcommand - display snippet content."""
+    from .inline import read_snippet_content
+    from .records import RecordWriter, snippet_record
+    
+    base_dir = Path(args.base_dir).resolve()
+    
+    if not base_dir.exists():
+        log.error(f"Base directory not found: {base_dir}")
+        return 1
+    
+    corpus = load_corpus(base_dir, args)
+    snippets = find_snippet_files(base_dir, corpus=corpus)
+    
+    # Find matching snippet
+    matching = [s for s in snippets if args.snippet in s.name]
+    
+    if not matching:
+        log.error(f"Snippet not found: {args.snippet}")
+        if args.format == 'text':
+            print("\nAvailable snippets:")
+            for s in snippets:
+                print(f"  - {s.name}")
+        return 1
+    
+    if args.format != 'text':
+        writer = RecordWriter(args.format)
+        for snippet in matching:
+            record = snippet_record(corpus.files[snippet], base_dir)
+            record['content'] = read_snippet_content(snippet, strip_headers=False)
+            writer.write(record)
+        writer.close()
+        return 0
+    
+    for snippet in matching:
+        try:
+            relative_path = snippet.relative_to(base_dir)
+        except ValueError:
+            relative_path = snippet
+            
+        print(f"\n{'='*60}")
+        print(f"File: {relative_path}")
+        print('='*60)
+        
+        content = read_snippet_content(snippet, strip_headers=False)
+        print(content)
+        print()
+    
+    return 0
+
+
+def flatten_command(args):
+    """Handle the 'flatten' subcommand - write one fully resolved file per guide."""
+    from .flatten import Flattener, flatten_guide
+    from .graph import build_include_graph, find_master_files
+    from .records import RecordWriter
+    
+    base_dir = Path(args.base_dir).resolve()
+    
+    if not base_dir.exists():
+        log.error(f"Base directory not found: {base_dir}")
+        return 1
+    
+    corpus = load_corpus(base_dir, args)
+    masters = find_master_files(corpus)
+    if args.guide:
+        missing = [guide for guide in args.guide if guide not in masters]
+        if missing:
+            log.error(f"Guide not found: {', '.join(missing)}")
+            return 1
+        masters = {guide: masters[guide] for guide in args.guide}
+    
+    if not masters:
+        log.error(f"No {MASTER_FILENAME} files found under {base_dir / DEFAULT_DOCS_DIR}")
+        return 1
+    
+    output_dir = Path(args.output_dir)
+    if not output_dir.is_absolute():
+        output_dir = base_dir / output_dir
+    
+    flattener = Flattener(build_include_graph(corpus))
+    writer = RecordWriter(args.format) if args.format != 'text' else None
+    unresolved_count = 0
+    
+    for guide, master in masters.items():
+        result = flatten_guide(flattener, master, output_dir / f"{guide}.adoc")
+        unresolved_count += len(result.unresolved)
+        if writer is not None:
+            writer.write({
+                'type': 'guide',
+                'guide': guide,
+                'master': str(display_path(master, base_dir)),
+                'output': str(display_path(result.output, base_dir)),
+                'lines': result.lines,
+                'includes': result.includes,
+                'unresolved': [
+                    {'path': str(display_path(path, base_dir)), 'line': line, 'target': target}
+                    for path, line, target in result.unresolved
+                ],
+            })
+        else:
+            print(f"{guide}: {display_path(result.output, base_dir)} "
+                  f"({result.lines} lines, {result.includes} includes expanded"
+                  + (f", {len(result.unresolved)} unresolved)" if result.unresolved else ")"))
+    
+    if writer is not None:
+        writer.close()
+    
+    return 1 if unresolved_count else 0
+
+
+def dedupe_command(args):
+    """Handle the 'dedupe' subcommand - report duplicated content blocks."""
+    from .dedupe import build_block_index
+    from .records import RecordWriter
+    
+    base_dir = Path(args.base_dir).resolve()
+    
+    if not base_dir.exists():
+        log.error(f"Base directory not found: {base_dir}")
+        return 1
+    
+    if not 0.0 < args.similarity <= 1.0:
+        log.error(f"--similarity must be in (0, 1], got {args.similarity}")
+        return 1
+    
+    corpus = load_corpus(base_dir, args)
+    index = build_block_index(corpus, args.min_lines, args.min_chars)
+    clusters = index.clusters(args.similarity, args.min_occurrences)
+    
+    if args.format != 'text':
+        writer = RecordWriter(args.format)
+        for cluster in clusters:
+            writer.write(cluster.record(base_dir))
+        writer.write({
+            'type': 'summary',
+            'clusters': len(clusters),
+            'duplicated_lines': sum((len(c.blocks) - 1) * c.line_count for c in clusters),
+        })
+        writer.close()
+        return 0
+    
+    if not clusters:
+        print("No duplicated blocks found.")
+        return 0
+    
+    print(f"\nFound {len(clusters)} duplicated block(s):\n")
+    for cluster in clusters:
+        similarity = '' if cluster.similarity == 1.0 else f", similarity >= {cluster.similarity:.2f}"
+        print(f"[{cluster.id}] {len(cluster.blocks)} occurrences, "
+              f"{cluster.line_count} lines{similarity}")
+        print(f"  {cluster.representative.lines[0].strip()}")
+        for block in cluster.blocks:
+            marker = '' if cluster.is_exact(block) else ' (similar)'
+            print(f"    {display_path(block.path, base_dir)}:{block.start}-{block.end}{marker}")
+        print()
+    
+    return 0
+
+
+def extract_command(args):
+    """Handle the 'extract' subcommand - turn a duplicated block into a snippet."""
+    from .dedupe import apply_extract_plan, build_block_index, build_extract_plan
+    from .graph import build_include_graph
+    
+    base_dir = Path(args.base_dir).resolve()
+    
+    if not base_dir.exists():
+        log.error(f"Base directory not found: {base_dir}")
+        return 1
+    
+    if not 0.0 < args.similarity <= 1.0:
+        log.error(f"--similarity must be in (0, 1], got {args.similarity}")
+        return 1
+    
+    name = args.name if args.name.endswith('.adoc') else f"{args.name}.adoc"
+    snippet_dir = Path(args.directory)
+    if not snippet_dir.is_absolute():
+        snippet_dir = base_dir / snippet_dir
+    snippet = Path(os.path.realpath(snippet_dir)) / name
+    if snippet.exists():
+        log.error(f"Snippet file already exists: {snippet}")
+        return 1
+    
+    corpus = load_corpus(base_dir, args)
+    index = build_block_index(corpus, args.min_lines, args.min_chars)
+    clusters = [c for c in index.clusters(args.similarity, args.min_occurrences)
+                if c.id.startswith(args.cluster)]
+    if len(clusters) != 1:
+        log.error(f"{'No' if not clusters else 'More than one'} duplicated block matches "
+                  f"{args.cluster}; run 'dedupe' with the same options to list cluster IDs")
+        return 1
+    
+    plan = build_extract_plan(clusters[0], snippet, corpus, build_include_graph(corpus))
+    for block in plan.skipped:
+        log.warning(f"Skipping {display_path(block.path, base_dir)}:{block.start}-{block.end}: "
+                    f"its text differs from the extracted block")
+    if plan.errors:
+        for error in plan.errors:
+            log.error(error)
+        return 1
+    
+    replaced_count = apply_extract_plan(plan, dry_run=args.dry_run)
+    
+    print(f"\n{'Would extract' if args.dry_run else 'Extracted'} {replaced_count} block(s) "
+          f"into {display_path(snippet, base_dir)}")
+    if args.dry_run:
+        print("\n(Dry run - no changes made)")
+        print(f"\n{plan.content}", end='')
+    
+    return 0
+
+
+def add_block_index_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the block size and similarity options shared by dedupe and extract."""
+    parser.add_argument(
+        '--min-lines',
+        type=int,
+        default=3,
+        help='Ignore blocks shorter than this many lines (default: 3)'
+    )
+    parser.add_argument(
+        '--min-chars',
+        type=int,
+        default=80,
+        help='Ignore blocks with less normalized text than this (default: 80)'
+    )
+    parser.add_argument(
+        '--min-occurrences',
+        type=int,
+        default=2,
+        help='Report only blocks found at least this many times (default: 2)'
+    )
+    parser.add_argument(
+        '--similarity',
+        type=float,
+        default=1.0,
+        help='Also group near-identical blocks whose word shingles have at least this '
+             'Jaccard similarity (default: 1.0, identical after normalization only)'
+    )
+
+
+def setup_parser(prog: Optional[str] = None) -> argparse.ArgumentParser:
+    """Set up command-line argument parser."""
+    parser = argparse.ArgumentParser(
+        prog=prog,
+        description="Process shared snippets in MTA documentation",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # List all snippet files
+  python replace_shared_snippets.py list
+  
+  # List snippets with usage information
+  python replace_shared_snippets.py list --show-usage
+  
+  # List the guides (master.adoc files) that pull in each snippet
+  python replace_shared_snippets.py list --show-masters
+  
+  # Show contents of a specific snippet
+  python replace_shared_snippets.py show developer-preview-admonition
+  
+  # Inline all snippets (dry run)
+  python replace_shared_snippets.py inline --dry-run
+  
+  # Inline a specific snippet
+  python replace_shared_snippets.py inline --snippet technology-preview-admonition.adoc
+  
+  # Inline snippets and delete the original files
+  python replace_shared_snippets.py inline --delete-snippets
+  
+  # Undo the last inline
+  python replace_shared_snippets.py inline --rollback
+  
+  # Validate snippet references
+  python replace_shared_snippets.py validate
+  
+  # Write one fully resolved file per guide to build/flattened/
+  python replace_shared_snippets.py flatten
+  
+  # Report blocks repeated across topics that could become snippets
+  python replace_shared_snippets.py dedupe --similarity 0.8
+  
+  # Replace a reported duplicate with an include of a new snippet
+  python replace_shared_snippets.py extract 81bdcf7f5b7c --name tech-preview-profiles
+  
+  # Pre-commit check of the files changed since HEAD
+  python replace_shared_snippets.py validate --changed-since HEAD
+  
+  # List the master.adoc files to rebuild for the changes on this branch
+  python replace_shared_snippets.py --format json affected --changed-since origin/main
+  
+  # Same, for a list of changed files on stdin
+  git diff --name-only origin/main | python replace_shared_snippets.py affected -
+  
+  # Keep revalidating while editing
+  python replace_shared_snippets.py watch
+  
+  # Answer editor queries on .snippet-cache/serve.sock, one JSON object per line
+  python replace_shared_snippets.py serve
+  echo '{"query": "who-includes", "path": "docs/topics/snippets/x.adoc"}' | nc -U .snippet-cache/serve.sock
+  
+  # Stream validation results as JSON lines for CI annotations
+  python replace_shared_snippets.py --format ndjson validate
+  
+  # Show where validation spends its time
+  python replace_shared_snippets.py --profile --profile-output validate.prof validate
+  
+  # Benchmark on a synthetic corpus of 10,000 modules
+  python replace_shared_snippets.py bench --files 10000
+  
+  # Compare per-pattern and combined regex matching
+  python replace_shared_snippets.py bench --micro
+  
+  # Check that heading rewriting time grows linearly with file size
+  python replace_shared_snippets.py bench --headings
+  
+  # Check snippet usage for each product variant (mta, mtr)
+  python replace_shared_snippets.py --all-variants validate
+  
+  # List snippet usage for the MTR build only
+  python replace_shared_snippets.py -a mtr -a mta! list --show-usage
+  
+  # Validate without reading or updating the .snippet-cache/ corpus cache
+  python replace_shared_snippets.py --no-cache validate
+  
+  # Parse files on all CPUs
+  python replace_shared_snippets.py --jobs 0 list --show-usage
+
+Snippet Identification:
+  Snippets are identified by any of the following:
+  - Filename: snippet_*.adoc, snippet-*.adoc, *-snippet.adoc
+  - Location: files in a 'snippets/' subdirectory
+  - Header: :_mod-docs-content-type: SNIPPET
+  - Header: :_content-type: SNIPPET
+  - Comment: // snippet (at start of file)
+"""
+    )
+    
+    parser.add_argument(
+        '--base-dir',
+        default='.',
+        help='Base directory of the MTA documentation repository (default: current directory)'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help=f'Do not read or update the corpus cache in {CACHE_DIR}/'
+    )
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Parse files with N worker processes; 0 uses all CPUs (default: 1)'
+    )
+    parser.add_argument(
+        '--format',
+        choices=OUTPUT_FORMATS,
+        default='text',
+        help='Output format for list, show, validate, affected, flatten and dedupe; ndjson streams one '
+             'record per line as results are found (default: text)'
+    )
+    parser.add_argument(
+        '--attribute', '-a',
+        action='append',
+        metavar='NAME[=VALUE]',
+        help='Evaluate ifdef/ifndef/ifeval for a build variant with this attribute set '
+             '(NAME! unsets it); may be repeated. Applies to list, validate, affected, watch and serve'
+    )
+    parser.add_argument(
+        '--all-variants',
+        action='store_true',
+        help='Evaluate conditionals once per variant declared in the attribute files '
+             '(for example mta and mtr) and report per-variant usage'
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Print time spent walking, resolving, reading, matching and writing, '
+             'with open() and byte counters, to stderr'
+    )
+    parser.add_argument(
+        '--profile-output',
+        metavar='FILE',
+        help='With --profile, also dump cProfile statistics to FILE (read with pstats)'
+    )
+    parser.add_argument(
+        '-v', '--verbose',
+        action='store_true',
+        help='Enable verbose output'
+    )
+    
+    subparsers = parser.add_subparsers(dest='command', help='Available commands')
+    
+    # List command
+    list_parser = subparsers.add_parser('list', help='List all snippet files')
+    list_parser.add_argument(
+        '--show-usage', '-u',
+        action='store_true',
+        help='Show where each snippet is used'
+    )
+    list_parser.add_argument(
+        '--show-masters', '-m',
+        action='store_true',
+        help='Show which master.adoc files transitively include each snippet'
+    )
+    
+    # Show command
+    show_parser = subparsers.add_parser('show', help='Show contents of a snippet file')
+    show_parser.add_argument(
+        'snippet',
+        help='Name (or partial name) of the snippet to show'
+    )
+    
+    # Inline command
+    inline_parser = subparsers.add_parser('inline', help='Inline snippets into including files')
+    inline_parser.add_argument(
+        '--dry-run', '-n',
+        action='store_true',
+        help='Show what would be done without making changes'
+    )
+    inline_parser.add_argument(
+        '--snippet', '-s',
+        help='Process only the specified snippet file (partial name match)'
+    )
+    inline_parser.add_argument(
+        '--keep-headers',
+        action='store_true',
+        help='Keep snippet content-type headers when inlining'
+    )
+    inline_parser.add_argument(
+        '--delete-snippets',
+        action='store_true',
+        help='Delete snippet files after inlining'
+    )
+    inline_parser.add_argument(
+        '--rollback',
+        action='store_true',
+        help=f'Restore the files changed by the last inline from its journal in {JOURNAL_DIR}/'
+    )
+    
+    # Validate command
+    validate_parser = subparsers.add_parser('validate', help='Validate snippet references, IDs, xrefs and images')
+    validate_parser.add_argument(
+        '--changed-since',
+        metavar='REF',
+        help='Only check files changed since the git REF, the snippets they include '
+             'and the files that include changed snippets'
+    )
+    
+    # Affected command
+    affected_parser = subparsers.add_parser(
+        'affected', help='List the master.adoc files that include any of the changed files')
+    affected_parser.add_argument(
+        'files',
+        nargs='*',
+        help="Changed files, relative to --base-dir; '-' reads one file per line from stdin"
+    )
+    affected_parser.add_argument(
+        '--changed-since',
+        metavar='REF',
+        help='Use the files changed since the git REF instead'
+    )
+    
+    # Flatten command
+    flatten_parser = subparsers.add_parser(
+        'flatten', help='Write each guide as a single file with every include expanded')
+    flatten_parser.add_argument(
+        '--output-dir', '-o',
+        default=DEFAULT_FLATTEN_DIR,
+        help=f'Directory for the flattened <guide>.adoc files, relative to --base-dir '
+             f'(default: {DEFAULT_FLATTEN_DIR})'
+    )
+    flatten_parser.add_argument(
+        '--guide', '-g',
+        action='append',
+        help='Flatten only this guide (directory name under docs/); may be repeated'
+    )
+    
+    # Dedupe command
+    dedupe_parser = subparsers.add_parser(
+        'dedupe', help='Report paragraphs and blocks duplicated across files')
+    add_block_index_arguments(dedupe_parser)
+    
+    # Extract command
+    extract_parser = subparsers.add_parser(
+        'extract', help='Move a duplicated block into a new snippet and include it where it appears verbatim')
+    extract_parser.add_argument(
+        'cluster',
+        help="ID (or ID prefix) of the duplicated block, as printed by 'dedupe'"
+    )
+    extract_parser.add_argument(
+        '--name',
+        required=True,
+        help='File name of the new snippet; .adoc is appended if missing'
+    )
+    extract_parser.add_argument(
+        '--directory',
+        default=DEFAULT_SNIPPETS_DIR,
+        help=f'Directory for the new snippet, relative to --base-dir (default: {DEFAULT_SNIPPETS_DIR})'
+    )
+    extract_parser.add_argument(
+        '--dry-run', '-n',
+        action='store_true',
+        help='Show the snippet and the files that would change without writing anything'
+    )
+    add_block_index_arguments(extract_parser)
+    
+    # Bench command
+    bench_parser = subparsers.add_parser(
+        'bench', help='Benchmark the snippet pipeline on a synthetic documentation corpus')
+    bench_parser.add_argument(
+        '--files',
+        type=int,
+        default=1000,
+        help='Number of modules to generate (default: 1000)'
+    )
+    bench_parser.add_argument(
+        '--snippets',
+        type=int,
+        default=50,
+        help='Number of snippet files to generate (default: 50)'
+    )
+    bench_parser.add_argument(
+        '--includes',
+        type=int,
+        default=3,
+        help='Snippet includes per module (default: 3)'
+    )
+    bench_parser.add_argument(
+        '--guides',
+        type=int,
+        default=4,
+        help='Number of guides (master.adoc files) to generate (default: 4)'
+    )
+    bench_parser.add_argument(
+        '--seed',
+        type=int,
+        default=0,
+        help='Random seed for the generated corpus (default: 0)'
+    )
+    bench_parser.add_argument(
+        '--micro',
+        action='store_true',
+        help='Compare the old per-pattern regex matching with the current include detection and replacement instead'
+    )
+    bench_parser.add_argument(
+        '--headings',
+        action='store_true',
+        help='Time the heading rewriter on synthetic documents of growing size instead'
+    )
+    bench_parser.add_argument(
+        '--output', '-o',
+        help='Generate the corpus in this empty directory and keep it (default: a temporary directory)'
+    )
+    
+    # Watch command
+    watch_parser = subparsers.add_parser('watch', help='Revalidate snippet references as files change')
+    watch_parser.add_argument(
+        '--interval',
+        type=float,
+        default=0.5,
+        help='Seconds between polls of the documentation tree (default: 0.5)'
+    )
+    
+    # Serve command
+    serve_parser = subparsers.add_parser(
+        'serve', help='Keep the include graph in memory and answer JSON queries on a Unix socket')
+    serve_parser.add_argument(
+        '--socket',
+        default=DEFAULT_SOCKET,
+        help=f'Path of the socket, relative to --base-dir (default: {DEFAULT_SOCKET}). Requests are '
+             f'JSON objects, one per line, with a "query" of who-includes, resolve-include, '
+             f'validate-file or show'
+    )
+    serve_parser.add_argument(
+        '--interval',
+        type=float,
+        default=0.5,
+        help='Seconds between polls for changed files while idle (default: 0.5)'
+    )
+    
+    return parser
+
+
+def main(argv: Optional[List[str]] = None, prog: Optional[str] = None):
+    parser = setup_parser(prog)
+    args = parser.parse_args(argv)
+    
+    # Configure logging here rather than at import time, so that importing
+    # the package leaves the embedding application's logging alone. With
+    # json and ndjson, log messages go to stderr to keep stdout parseable.
+    logging.basicConfig(
+        format='%(levelname)s: %(message)s',
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        stream=sys.stdout if args.format == 'text' else sys.stderr
+    )
+    
+    if not args.profile:
+        return run_command(parser, args)
+    
+    PROFILER.enabled = True
+    profile = None
+    if args.profile_output:
+        import cProfile
+        profile = cProfile.Profile()
+        profile.enable()
+    start = time.perf_counter()
+    try:
+        return run_command(parser, args)
+    finally:
+        wall_seconds = time.perf_counter() - start
+        if profile is not None:
+            profile.disable()
+            profile.dump_stats(args.profile_output)
+        PROFILER.report(wall_seconds)
+        if args.jobs != 1:
+            print("  (work done in --jobs worker processes is not included)", file=sys.stderr)
+        if profile is not None:
+            print(f"  cProfile statistics written to {args.profile_output}", file=sys.stderr)
+
+
+def run_command(parser: argparse.ArgumentParser, args) -> int:
+    """Dispatch to the handler for the selected subcommand."""
+    if args.command == 'list':
+        return list_snippets_command(args)
+    elif args.command == 'show':
+        return show_command(args)
+    elif args.command == 'inline':
+        return inline_command(args)
+    elif args.command == 'validate':
+        return validate_command(args)
+    elif args.command == 'watch':
+        return watch_command(args)
+    elif args.command == 'affected':
+        return affected_command(args)
+    elif args.command == 'serve':
+        return serve_command(args)
+    elif args.command == 'flatten':
+        return flatten_command(args)
+    elif args.command == 'dedupe':
+        return dedupe_command(args)
+    elif args.command == 'extract':
+        return extract_command(args)
+    elif args.command == 'bench':
+        return bench_command(args)
+    else:
+        parser.print_help()
+        return 0
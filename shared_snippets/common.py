@@ -0,0 +1,311 @@
+"""
+Constants, patterns, profiling and file helpers shared by the whole package.
+"""
+
+import contextlib
+import functools
+import hashlib
+import logging
+import os
+import re
+import shutil
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+log = logging.getLogger(__name__)
+
+
+# Regular expressions for AsciiDoc processing
+INCLUDE_RE = re.compile(r'^include::([^\[\n]+)\[(.*?)\]', re.MULTILINE)
+ATTRIBUTE_DEF_RE = re.compile(r'^:(!?)(\w[\w-]*)(!?):[ \t]*(.*?)[ \t]*$')
+ATTRIBUTE_REF_RE = re.compile(r'\{(\w[\w-]*)\}')
+CONDITIONAL_RE = re.compile(r'^(ifdef|ifndef|ifeval)::([^\[]*)\[(.*)\]\s*$')
+ENDIF_RE = re.compile(r'^endif::[^\[]*\[\]\s*$')
+IFEVAL_RE = re.compile(r'^\s*(.*?)\s*(==|!=|<=|>=|<|>)\s*(.*?)\s*$')
+INCLUDE_OPTION_RE = re.compile(r'(\w+)=("[^"]*"|[^,]*)')
+TAG_DIRECTIVE_RE = re.compile(r'\b(tag|end)::(\S+?)\[\]')
+SECTION_TITLE_RE = re.compile(r'^(=+)([ \t]+\S.*)$')
+BLOCK_DELIMITER_RE = re.compile(r'^(-{4,}|={4,}|\.{4,}|\*{4,}|_{4,}|\+{4,}|/{4,}|\|===)$')
+
+# Line kinds reported by BlockTokenizer. Delimited blocks are listing
+# (----), literal (....), passthrough (++++), comment (////), example
+# (====), sidebar (****), quote (____), open (--) and tables (|===).
+LINE_TEXT = 'text'
+LINE_TITLE = 'title'
+LINE_DELIMITER = 'delimiter'
+LINE_VERBATIM = 'verbatim'
+LINE_COMMENT = 'comment'
+DELIMITED_BLOCK_RE = re.compile(r'^(?:-{4,}|\.{4,}|\+{4,}|/{4,}|={4,}|\*{4,}|_{4,}|--|[|,:!]===)[ \t]*$')
+DELIMITER_CHARS = frozenset('-.+/=*_|,:!')
+VERBATIM_DELIMITER_CHARS = frozenset('-.+/')
+
+# Snippet identification patterns
+SNIPPET_NAME_PATTERNS = [
+    re.compile(r'^snippet[_-].*\.adoc$', re.IGNORECASE),  # snippet_*.adoc, snippet-*.adoc
+    re.compile(r'.*[_-]snippet\.adoc$', re.IGNORECASE),   # *-snippet.adoc, *_snippet.adoc
+]
+
+# Header patterns that identify snippet files
+SNIPPET_HEADER_PATTERNS = [
+    re.compile(r'^:_mod-docs-content-type:\s*SNIPPET', re.MULTILINE | re.IGNORECASE),
+    re.compile(r'^:_content-type:\s*SNIPPET', re.MULTILINE | re.IGNORECASE),
+    re.compile(r'^//\s*snippet\s*$', re.MULTILINE | re.IGNORECASE),
+]
+CONTENT_TYPE_RE = re.compile(r'^:_(?:mod-docs-)?content-type:', re.IGNORECASE)
+SNIPPET_HEADER = ":_mod-docs-content-type: SNIPPET"
+
+# Single-pass matcher combining INCLUDE_RE and SNIPPET_HEADER_PATTERNS:
+# every include directive plus any snippet header line, in one scan
+SCAN_RE = re.compile(
+    r'^(?:include::(?P<target>[^\[\n]+)\[(?P<options>.*?)\]'
+    r'|(?P<header>(?i::_mod-docs-content-type:\s*SNIPPET|:_content-type:\s*SNIPPET|//\s*snippet\s*$)))',
+    re.MULTILINE
+)
+
+# Cross-reference scan: block IDs, xrefs, image macros, attribute entries
+# and conditionals, which decide what the IDs and targets expand to
+REFERENCE_RE = re.compile(
+    r'^\[\[(?P<anchor>[^\[\],\s]+)[^\]\n]*\]\]'
+    r'|^\[(?:id=["\']?(?P<id>[^"\'\],\s]+)|[\w-]*#(?P<short>[^\].%,\s]+))'
+    r'|xref:(?P<xref>[^\[\s]+)\['
+    r'|(?<![\w-])image::?(?P<image>[^\s\[\]]+)\['
+    r'|<<(?P<xref2>[^,>\s]+)[^>\n]*>>'
+    r'|^(?P<cond>ifdef|ifndef|ifeval|endif)::(?P<names>[^\[\n]*)\[(?P<content>[^\n]*)\][ \t]*$'
+    r'|^:(?P<unset>!?)(?P<attr>\w[\w-]*)(?P<unset2>!?):[ \t]*(?P<value>[^\n]*?)[ \t]*$',
+    re.MULTILINE
+)
+REFERENCE_BYTES_RE = re.compile(REFERENCE_RE.pattern.encode('utf-8'), re.MULTILINE)
+# Lines that decide where references count: block delimiters and line comments
+STRUCTURE_RE = re.compile(DELIMITED_BLOCK_RE.pattern + '|^//', re.MULTILINE)
+STRUCTURE_BYTES_RE = re.compile(STRUCTURE_RE.pattern.encode('utf-8'), re.MULTILINE)
+IMAGE_MACRO_RE = re.compile(r'(?<![\w-])image::?([^\s\[\]]+)\[')
+
+# Kinds of the events in CorpusFile.references
+REF_ANCHOR = 'anchor'
+REF_XREF = 'xref'
+REF_IMAGE = 'image'
+REF_SET = 'set'
+REF_UNSET = 'unset'
+
+# Default paths for MTA documentation
+DEFAULT_DOCS_DIR = "docs"
+DEFAULT_TOPICS_DIR = "docs/topics"
+DEFAULT_ASSEMBLIES_DIR = "assemblies"
+DEFAULT_ATTRIBUTES_FILE = "docs/topics/templates/document-attributes.adoc"
+DEFAULT_SNIPPETS_DIR = "docs/topics/snippets"
+DEFAULT_IMAGES_DIR = "docs/topics/images"
+MASTER_FILENAME = "master.adoc"
+DEFAULT_FLATTEN_DIR = "build/flattened"
+
+# Output formats for list, show and validate
+OUTPUT_FORMATS = ('text', 'json', 'ndjson')
+
+# Directories never descended into while scanning
+SKIP_DIRS = ('build', '_site', 'tmp', 'website', '.snippet-cache', '.snippet-journal', '.git')
+SKIP_DIRS_SET = frozenset(SKIP_DIRS)
+
+# Number of leading characters inspected for snippet headers
+HEADER_SCAN_CHARS = 500
+
+# Files at least this large are memory-mapped and scanned for include
+# directives with bytes searches instead of being decoded whole
+MMAP_THRESHOLD = 64 * 1024
+INCLUDE_PREFIX = b'include::'
+NEWLINE_RE = re.compile(rb'\n')
+
+# Duplicate detection: words per shingle, and shingles shared by more
+# blocks than this are too common to suggest a duplicate
+SHINGLE_SIZE = 5
+MAX_SHINGLE_POSTINGS = 50
+
+# On-disk corpus cache, relative to the base directory
+CACHE_DIR = ".snippet-cache"
+CACHE_FILE = "corpus.json"
+CACHE_VERSION = 4
+
+# Staged rewrites and backups of inline transactions, relative to the base directory
+JOURNAL_DIR = ".snippet-journal"
+JOURNAL_FILE = "journal.json"
+
+# Unix domain socket of the serve subcommand, relative to the base directory
+DEFAULT_SOCKET = f"{CACHE_DIR}/serve.sock"
+
+
+class Profiler:
+    """
+    Accumulates time and I/O counters per hot-path category for --profile.
+
+    Categories are 'walk' (directory listing), 'resolve' (symlink
+    resolution), 'stat', 'read', 'regex' and 'write'. When disabled,
+    timer() returns a shared no-op context so instrumentation is cheap;
+    the I/O counters are always kept, so bench can read them per phase.
+    Time spent inside --jobs worker processes is not counted, the files
+    they read are.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.opens = 0
+        self.reads = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._null = contextlib.nullcontext()
+
+    def timer(self, category: str):
+        if not self.enabled:
+            return self._null
+        return self._timed(category)
+
+    @contextlib.contextmanager
+    def _timed(self, category: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[category] += time.perf_counter() - start
+            self.calls[category] += 1
+
+    def count_read(self, nbytes: int) -> None:
+        self.opens += 1
+        self.reads += 1
+        self.bytes_read += nbytes
+
+    def count_write(self, nbytes: int) -> None:
+        self.opens += 1
+        self.bytes_written += nbytes
+
+    def report(self, wall_seconds: float, stream=None) -> None:
+        """Print the breakdown table."""
+        stream = stream if stream is not None else sys.stderr
+        print(f"\nProfile ({wall_seconds:.3f} s wall):", file=stream)
+        print(f"  {'Category':<10} {'Calls':>10} {'Time (s)':>10} {'% wall':>8}", file=stream)
+        for category in PROFILE_CATEGORIES:
+            seconds = self.seconds.get(category, 0.0)
+            share = 100 * seconds / wall_seconds if wall_seconds else 0.0
+            print(f"  {category:<10} {self.calls.get(category, 0):>10} {seconds:>10.3f} {share:>7.1f}%",
+                  file=stream)
+        print(f"  open() calls: {self.opens}", file=stream)
+        print(f"  Bytes read: {self.bytes_read}", file=stream)
+        print(f"  Bytes written: {self.bytes_written}", file=stream)
+
+
+PROFILE_CATEGORIES = ('walk', 'resolve', 'stat', 'read', 'regex', 'write')
+PROFILER = Profiler()
+
+
+def read_text(path: Path) -> str:
+    """Read a whole UTF-8 text file, counted by the profiler."""
+    with PROFILER.timer('read'):
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+    PROFILER.count_read(len(content))
+    return content
+
+
+def display_path(path: Path, base_dir: Path) -> Path:
+    """Return path relative to base_dir when possible, for printing."""
+    try:
+        return path.relative_to(base_dir)
+    except ValueError:
+        return path
+
+
+@functools.lru_cache(maxsize=None)
+def default_file_mode() -> int:
+    """Return the mode open() gives new files under the process umask."""
+    # The umask can only be read by setting it; do so once, and put it back
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+@contextlib.contextmanager
+def open_atomic(path: Path) -> Iterator:
+    """
+    Open a temporary file next to path for writing and rename it over path
+    when the block exits cleanly, so path is either fully old or fully new,
+    never partial. On error the temporary file is removed. The file keeps
+    the mode of the one it replaces; a new file gets the usual mode for
+    the umask rather than the temporary file's 0600.
+    """
+    import tempfile
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            yield f
+        if path.exists():
+            shutil.copymode(path, tmp_path)
+        else:
+            os.chmod(tmp_path, default_file_mode())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_file_atomic(path: Path, content: str) -> None:
+    """Write content to path atomically via open_atomic()."""
+    with PROFILER.timer('write'):
+        with open_atomic(path) as f:
+            f.write(content)
+    PROFILER.count_write(len(content))
+
+
+def fsync_directory(path: Path) -> None:
+    """Flush a directory entry change (create, rename, unlink) to disk where supported."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def file_digest(path: Path) -> Optional[str]:
+    """Return the SHA-1 of a file's bytes, or None if it does not exist."""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def git_changed_files(base_dir: Path, ref: str) -> Optional[List[Path]]:
+    """
+    Return the resolved paths of files changed since ref according to git.
+
+    This is `git diff --name-only <ref>` (committed, staged and unstaged
+    changes) plus untracked files, limited to base_dir. Returns None if
+    git fails, for example because ref does not exist.
+    """
+    import subprocess
+
+    commands = [
+        ['git', 'diff', '--name-only', '--relative', ref, '--'],
+        ['git', 'ls-files', '--others', '--exclude-standard'],
+    ]
+    names: List[str] = []
+    for command in commands:
+        try:
+            result = subprocess.run(command, cwd=base_dir, capture_output=True, text=True)
+        except OSError as e:
+            log.error(f"Could not run git: {e}")
+            return None
+        if result.returncode != 0:
+            log.error(f"{' '.join(command)} failed: {result.stderr.strip()}")
+            return None
+        names.extend(line for line in result.stdout.splitlines() if line)
+    return [Path(os.path.realpath(base_dir / name)) for name in dict.fromkeys(names)]
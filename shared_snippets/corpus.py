@@ -0,0 +1,736 @@
+"""
+The single-pass corpus scan: snippet detection, include and reference
+extraction, the directory walker and the on-disk corpus cache.
+"""
+
+import bisect
+import hashlib
+import json
+import logging
+import mmap
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from .common import (
+    CACHE_DIR, CACHE_FILE, CACHE_VERSION, DEFAULT_ASSEMBLIES_DIR, DEFAULT_DOCS_DIR,
+    DEFAULT_TOPICS_DIR, DELIMITED_BLOCK_RE, DELIMITER_CHARS, HEADER_SCAN_CHARS, IMAGE_MACRO_RE,
+    INCLUDE_PREFIX, INCLUDE_RE, LINE_COMMENT, LINE_DELIMITER, LINE_TEXT, LINE_TITLE,
+    LINE_VERBATIM, MMAP_THRESHOLD, NEWLINE_RE, PROFILER, REFERENCE_BYTES_RE, REFERENCE_RE,
+    REF_ANCHOR, REF_IMAGE, REF_SET, REF_UNSET, REF_XREF, SCAN_RE, SECTION_TITLE_RE, SKIP_DIRS,
+    SNIPPET_HEADER_PATTERNS, SNIPPET_NAME_PATTERNS, STRUCTURE_BYTES_RE, STRUCTURE_RE,
+    VERBATIM_DELIMITER_CHARS, write_file_atomic,
+)
+
+log = logging.getLogger(__name__)
+
+
+def is_snippet_by_name(filename: str) -> bool:
+    """Check if a file is a snippet based on its filename."""
+    return any(pattern.match(filename) for pattern in SNIPPET_NAME_PATTERNS)
+
+
+def is_snippet_by_content(filepath: Path) -> bool:
+    """Check if a file is a snippet based on its content headers."""
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            content = f.read(HEADER_SCAN_CHARS)
+        return has_snippet_header(content)
+    except Exception as e:
+        log.warning(f"Could not read {filepath}: {e}")
+        return False
+
+
+def is_in_snippets_dir(filepath: Path) -> bool:
+    """Check if a file is located in a snippets directory."""
+    return 'snippets' in filepath.parts
+
+
+def has_snippet_header(content: str) -> bool:
+    """Check if file content starts with one of the snippet headers."""
+    head = content[:HEADER_SCAN_CHARS]
+    return any(pattern.search(head) for pattern in SNIPPET_HEADER_PATTERNS)
+
+
+@dataclass
+class IncludeDirective:
+    """A single include:: directive found in a documentation file."""
+    target: str
+    options: str
+    line_number: int
+    text: str
+
+
+@dataclass
+class CorpusFile:
+    """
+    Everything the subcommands need to know about one resolved .adoc file.
+
+    `path` is the resolved path used as the identity of the file, while
+    `logical_path` is the first path the walker reached it through, which
+    is what include targets are resolved against.
+    """
+    path: Path
+    logical_path: Path
+    mtime_ns: int = 0
+    size: int = 0
+    digest: str = ''
+    has_header: bool = False
+    snippet_reasons: List[str] = field(default_factory=list)
+    includes: List[IncludeDirective] = field(default_factory=list)
+    # (line, kind, name, value) for block IDs, xrefs, images, attribute
+    # entries and conditionals, in line order; see scan_references()
+    references: List[Tuple[int, str, str, Optional[str]]] = field(default_factory=list)
+    in_docs_tree: bool = False
+    readable: bool = True
+
+    @property
+    def is_snippet(self) -> bool:
+        return bool(self.snippet_reasons)
+
+    def cache_record(self) -> dict:
+        """Return the content-derived fields in a JSON-serializable form."""
+        return {
+            'mtime_ns': self.mtime_ns,
+            'size': self.size,
+            'digest': self.digest,
+            'header': self.has_header,
+            'includes': [[i.target, i.options, i.line_number, i.text] for i in self.includes],
+            'references': [list(reference) for reference in self.references],
+        }
+
+    def load_cache_record(self, record: dict) -> None:
+        """Restore the content-derived fields from a cache record."""
+        self.digest = record['digest']
+        self.has_header = record['header']
+        self.includes = [IncludeDirective(*fields) for fields in record['includes']]
+        self.references = [tuple(reference) for reference in record['references']]
+
+
+class Corpus:
+    """
+    In-memory model of the documentation tree.
+
+    Built by a single scan that reads each resolved file exactly once and
+    shared by all subcommands, so nothing needs to walk or re-read the tree.
+    """
+
+    def __init__(self, base_dir: Path):
+        self.base_dir = base_dir
+        self.files: Dict[Path, CorpusFile] = {}
+        self.parsed_count = 0  # Files actually read during this scan
+        self.bytes_read = 0
+        self.walker = TreeWalker()
+
+    def logical_paths(self, path: Path) -> List[Path]:
+        """Return the paths (symlink aliases included) a file was reached through."""
+        return self.walker.logical_paths(path)
+
+    def __contains__(self, path: Path) -> bool:
+        return path in self.files
+
+    def get(self, path: Path) -> Optional[CorpusFile]:
+        return self.files.get(path)
+
+    def snippets(self) -> List[Path]:
+        """Return the sorted resolved paths of all snippet files."""
+        return sorted(path for path, entry in self.files.items() if entry.is_snippet)
+
+    def docs_files(self) -> Iterator[CorpusFile]:
+        """Yield files under docs/ and assemblies/ in scan order."""
+        return (entry for entry in self.files.values() if entry.in_docs_tree)
+
+
+def extract_includes(content: str) -> List[IncludeDirective]:
+    """Find all include directives in content, numbering lines from 1."""
+    includes = []
+    line_number = 1
+    last_pos = 0
+    for match in INCLUDE_RE.finditer(content):
+        line_number += content.count('\n', last_pos, match.start())
+        last_pos = match.start()
+        includes.append(IncludeDirective(
+            target=match.group(1),
+            options=match.group(2),
+            line_number=line_number,
+            text=match.group(0),
+        ))
+    return includes
+
+
+def scan_adoc_content(content: str) -> Tuple[bool, List[IncludeDirective]]:
+    """
+    Classify the snippet header and find all include directives in one scan.
+
+    Equivalent to has_snippet_header() plus extract_includes(), using the
+    combined SCAN_RE so each file is matched once instead of four times.
+    """
+    header = False
+    includes = []
+    line_number = 1
+    last_pos = 0
+    for match in SCAN_RE.finditer(content):
+        target = match.group('target')
+        if target is None:
+            if match.start() < HEADER_SCAN_CHARS:
+                header = True
+            continue
+        line_number += content.count('\n', last_pos, match.start())
+        last_pos = match.start()
+        includes.append(IncludeDirective(
+            target=target,
+            options=match.group('options'),
+            line_number=line_number,
+            text=match.group(0),
+        ))
+    return header, includes
+
+
+def xref_target_id(target: str) -> Optional[str]:
+    """Return the ID an xref points at, or None for links to whole documents and URLs."""
+    if '://' in target:
+        return None
+    if '#' in target:
+        return target.split('#', 1)[1] or None
+    if target.endswith('.adoc'):
+        return None
+    return target
+
+
+class BlockTokenizer:
+    """
+    Classifies AsciiDoc lines one at a time, tracking delimited blocks.
+
+    Each line is one of LINE_TITLE (a section title or discrete heading),
+    LINE_DELIMITER (a line opening or closing a delimited block),
+    LINE_VERBATIM (inside a listing, literal, passthrough or comment
+    block, where nothing is parsed), LINE_COMMENT (a // line comment) or
+    LINE_TEXT. Compound blocks (example, sidebar, quote, open, table) nest
+    and are closed by their own delimiter; verbatim blocks end only at
+    their exact delimiter. Work per line is constant, so a file is
+    classified in linear time.
+    """
+
+    def __init__(self):
+        self.stack: List[str] = []
+
+    @property
+    def in_verbatim(self) -> bool:
+        # The open block delimiter -- shares its character with listing blocks
+        return bool(self.stack) and self.stack[-1][0] in VERBATIM_DELIMITER_CHARS and self.stack[-1] != '--'
+
+    def classify(self, line: str) -> str:
+        if self.in_verbatim:
+            if line.rstrip() == self.stack[-1]:
+                self.stack.pop()
+                return LINE_DELIMITER
+            return LINE_VERBATIM
+        first = line[:1]
+        if first in DELIMITER_CHARS and DELIMITED_BLOCK_RE.match(line):
+            delimiter = line.rstrip()
+            if self.stack and self.stack[-1] == delimiter:
+                self.stack.pop()
+            else:
+                self.stack.append(delimiter)
+            return LINE_DELIMITER
+        if first == '/' and line.startswith('//'):
+            return LINE_COMMENT
+        if first == '=' and SECTION_TITLE_RE.match(line):
+            return LINE_TITLE
+        return LINE_TEXT
+
+
+def ignored_lines(matches: Iterator, line_of: Callable[[int], int],
+                  decode: Callable = str) -> Callable[[int], bool]:
+    """
+    Turn STRUCTURE_RE (or STRUCTURE_BYTES_RE) matches into a test for the
+    line numbers whose IDs, xrefs, images and attribute entries do not
+    count: line comments, block delimiters, and lines inside comment,
+    listing, literal and passthrough blocks.
+
+    Only delimiter and comment lines can change what the BlockTokenizer
+    makes of the lines after them, so feeding it just those lines gives
+    the same block structure as tokenizing the whole file.
+    """
+    tokenizer = BlockTokenizer()
+    lines: Set[int] = set()
+    starts: List[int] = []  # Verbatim blocks as parallel sorted lists
+    ends: List[int] = []
+    for match in matches:
+        line = line_of(match.start())
+        kind = tokenizer.classify(decode(match.group(0)))
+        if kind == LINE_COMMENT:
+            lines.add(line)
+        elif kind == LINE_DELIMITER:
+            lines.add(line)
+            if tokenizer.in_verbatim and len(starts) == len(ends):
+                starts.append(line)
+            elif not tokenizer.in_verbatim and len(starts) > len(ends):
+                ends.append(line)
+    if len(starts) > len(ends):
+        # An unterminated block runs to the end of the file
+        ends.append(float('inf'))
+
+    def ignored(line: int) -> bool:
+        if line in lines:
+            return True
+        index = bisect.bisect_right(starts, line) - 1
+        return index >= 0 and line < ends[index]
+
+    return ignored
+
+
+def reference_events(matches: Iterator, line_of: Callable[[int], int], ignored: Callable[[int], bool],
+                     decode: Callable = str) -> List[Tuple[int, str, str, Optional[str]]]:
+    """
+    Turn REFERENCE_RE (or REFERENCE_BYTES_RE) matches into reference events.
+
+    Conditionals are preprocessor directives and always count; anything
+    else on a line that ignored() rejects is dropped.
+    """
+    events = []
+    for match in matches:
+        groups = {name: decode(value) for name, value in match.groupdict().items() if value is not None}
+        line = line_of(match.start())
+        if 'cond' not in groups and ignored(line):
+            continue
+        if 'anchor' in groups or 'id' in groups or 'short' in groups:
+            anchor = groups.get('anchor') or groups.get('id') or groups['short']
+            events.append((line, REF_ANCHOR, anchor, None))
+        elif 'xref' in groups or 'xref2' in groups:
+            target = xref_target_id(groups.get('xref') or groups['xref2'])
+            if target:
+                events.append((line, REF_XREF, target, None))
+        elif 'image' in groups:
+            events.append((line, REF_IMAGE, groups['image'], None))
+        elif 'cond' in groups:
+            events.append((line, groups['cond'], groups['names'], groups['content']))
+        elif groups['unset'] or groups['unset2']:
+            events.append((line, REF_UNSET, groups['attr'], None))
+        else:
+            events.append((line, REF_SET, groups['attr'], groups['value']))
+            # An image in an attribute value, such as :kebab: image:kebab.png[],
+            # counts as used wherever the attribute is defined
+            events.extend((line, REF_IMAGE, target, None)
+                          for target in IMAGE_MACRO_RE.findall(groups['value']))
+    return events
+
+
+def scan_references(content: str) -> List[Tuple[int, str, str, Optional[str]]]:
+    """
+    Find block IDs ([id="..."], [#...], [[...]]), xrefs (xref:...[] and
+    <<...>>), image macros, attribute entries and conditionals, numbering
+    lines from 1.
+
+    IDs and targets are kept unexpanded: they usually contain {context},
+    whose value depends on the assembly and master they are read through.
+    Comments and verbatim blocks are skipped; see ignored_lines().
+    """
+    def line_counter() -> Callable[[int], int]:
+        position = [0, 1]  # Last offset seen and its line number
+
+        def line_of(offset: int) -> int:
+            position[1] += content.count('\n', position[0], offset)
+            position[0] = offset
+            return position[1]
+
+        return line_of
+
+    ignored = ignored_lines(STRUCTURE_RE.finditer(content), line_counter())
+    return reference_events(REFERENCE_RE.finditer(content), line_counter(), ignored)
+
+
+class MappedAdoc:
+    """
+    Memory-mapped view of an .adoc file.
+
+    Include directives are located with bytes searches for include:: at
+    line starts, so only the directive lines are decoded. Line numbers
+    come from a newline offset index that is only extended as far as the
+    offsets actually asked about.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self._newlines: List[int] = []
+        self._indexed_to = 0
+
+    def line_number(self, offset: int) -> int:
+        """Return the 1-based line number of a byte offset."""
+        if offset > self._indexed_to:
+            self._newlines.extend(m.start() for m in NEWLINE_RE.finditer(self.data, self._indexed_to, offset))
+            self._indexed_to = offset
+        return bisect.bisect_left(self._newlines, offset) + 1
+
+    def include_offsets(self) -> Iterator[int]:
+        """Yield the offset of every line starting with include::."""
+        data = self.data
+        if data[:len(INCLUDE_PREFIX)] == INCLUDE_PREFIX:
+            yield 0
+        needle = b'\n' + INCLUDE_PREFIX
+        pos = data.find(needle)
+        while pos != -1:
+            yield pos + 1
+            pos = data.find(needle, pos + 1)
+
+    def line_at(self, offset: int) -> str:
+        """Decode the line starting at a byte offset."""
+        end = self.data.find(b'\n', offset)
+        if end == -1:
+            end = len(self.data)
+        return self.data[offset:end].decode('utf-8')
+
+    def head(self) -> str:
+        """Decode the leading characters inspected for snippet headers."""
+        # A UTF-8 character takes at most four bytes
+        return self.data[:HEADER_SCAN_CHARS * 4].decode('utf-8', errors='ignore')[:HEADER_SCAN_CHARS]
+
+    def references(self) -> List[Tuple[int, str, str, Optional[str]]]:
+        """Same result as scan_references() on the decoded file."""
+        def decode(value: bytes) -> str:
+            return value.decode('utf-8')
+
+        ignored = ignored_lines(STRUCTURE_BYTES_RE.finditer(self.data), self.line_number, decode)
+        return reference_events(REFERENCE_BYTES_RE.finditer(self.data), self.line_number, ignored, decode)
+
+    def scan(self) -> Tuple[bool, List[IncludeDirective]]:
+        """Same result as scan_adoc_content() on the decoded file."""
+        includes = []
+        for offset in self.include_offsets():
+            match = INCLUDE_RE.match(self.line_at(offset))
+            if match:
+                includes.append(IncludeDirective(
+                    target=match.group(1),
+                    options=match.group(2),
+                    line_number=self.line_number(offset),
+                    text=match.group(0),
+                ))
+        return has_snippet_header(self.head()), includes
+
+
+def classify_snippet(filepath: Path, resolved_path: Path, header: bool) -> List[str]:
+    """Return the reasons a file counts as a snippet (empty if it does not)."""
+    reasons = []
+    if is_snippet_by_name(filepath.name):
+        reasons.append("name")
+    if is_in_snippets_dir(filepath) or is_in_snippets_dir(resolved_path):
+        reasons.append("snippets dir")
+    if header:
+        reasons.append("header")
+    return reasons
+
+
+def parse_adoc_file(filepath: Path, resolved_path: Path, in_docs_tree: bool,
+                    cached: Optional[dict] = None) -> Tuple[CorpusFile, bool]:
+    """
+    Build the corpus entry for a file, reading it at most once.
+
+    If a cache record is given and the file's mtime and size still match,
+    the file is not opened at all. If only the metadata changed but the
+    content hash matches, the cached include directives are reused.
+
+    Returns the entry and whether the file had to be read.
+    """
+    entry = CorpusFile(path=resolved_path, logical_path=filepath, in_docs_tree=in_docs_tree)
+    was_read = False
+    try:
+        with PROFILER.timer('stat'):
+            st = os.stat(filepath)
+        entry.mtime_ns = st.st_mtime_ns
+        entry.size = st.st_size
+
+        if cached and cached['mtime_ns'] == entry.mtime_ns and cached['size'] == entry.size:
+            entry.load_cache_record(cached)
+        elif entry.size >= MMAP_THRESHOLD:
+            with open(filepath, 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                # Hashing the map is what pages the file in
+                with PROFILER.timer('read'):
+                    digest = hashlib.sha1(data).hexdigest()
+                was_read = True
+                if cached and cached['digest'] == digest:
+                    entry.load_cache_record(cached)
+                else:
+                    entry.digest = digest
+                    with PROFILER.timer('regex'):
+                        mapped = MappedAdoc(data)
+                        entry.has_header, entry.includes = mapped.scan()
+                        entry.references = mapped.references()
+            PROFILER.count_read(entry.size)
+        else:
+            with PROFILER.timer('read'):
+                with open(filepath, 'rb') as f:
+                    data = f.read()
+            PROFILER.count_read(len(data))
+            was_read = True
+            digest = hashlib.sha1(data).hexdigest()
+
+            if cached and cached['digest'] == digest:
+                entry.load_cache_record(cached)
+            else:
+                content = data.decode('utf-8')
+                entry.digest = digest
+                with PROFILER.timer('regex'):
+                    entry.has_header, entry.includes = scan_adoc_content(content)
+                    entry.references = scan_references(content)
+    except Exception as e:
+        log.warning(f"Could not read {filepath}: {e}")
+        entry.readable = False
+    entry.snippet_reasons = classify_snippet(filepath, resolved_path, entry.has_header)
+    return entry, was_read
+
+
+def cache_key(base_dir: Path, path: Path) -> str:
+    """Return the key a resolved path is stored under in the corpus cache."""
+    return os.path.relpath(path, base_dir)
+
+
+def load_corpus_cache(base_dir: Path) -> Dict[str, dict]:
+    """Load cached per-file records, returning an empty dict if unusable."""
+    cache_path = base_dir / CACHE_DIR / CACHE_FILE
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        log.debug(f"Ignoring unreadable cache {cache_path}: {e}")
+        return {}
+
+    if data.get('version') != CACHE_VERSION:
+        log.debug(f"Ignoring cache {cache_path} with version {data.get('version')}")
+        return {}
+    return data.get('files', {})
+
+
+def save_corpus_cache(corpus: Corpus) -> None:
+    """Write the corpus cache atomically so readers never see a partial file."""
+    cache_dir = corpus.base_dir / CACHE_DIR
+    records = {
+        cache_key(corpus.base_dir, path): entry.cache_record()
+        for path, entry in corpus.files.items()
+        if entry.readable
+    }
+    try:
+        cache_dir.mkdir(exist_ok=True)
+        write_file_atomic(cache_dir / CACHE_FILE,
+                          json.dumps({'version': CACHE_VERSION, 'files': records}))
+    except OSError as e:
+        log.warning(f"Could not write cache in {cache_dir}: {e}")
+
+
+class TreeWalker:
+    """
+    Symlink-aware directory walker that lists each real directory once.
+
+    Directories are identified by (st_dev, st_ino), so the symlinked
+    topics/ and assemblies/ directories are listed only the first time
+    they are reached, across every walk made with the same walker. Entries
+    come from os.scandir, whose cached types avoid a stat per file, and
+    resolved paths are derived from the real directory, so only symlinks
+    themselves are ever resolved.
+
+    Every logical path a real directory was reached through is recorded
+    in dir_aliases, even when it was not listed again, so alias paths can
+    still be reported.
+    """
+
+    def __init__(self):
+        self.visited: Set[Tuple[int, int]] = set()
+        self.dir_aliases: Dict[Path, List[Path]] = {}
+        self.dir_mtimes: Dict[Path, int] = {}
+
+    def walk(self, search_path: Path) -> Iterator[Tuple[Path, Path]]:
+        """
+        Yield (logical path, resolved path) for every .adoc file below
+        search_path, top-down in directory listing order like os.walk.
+        """
+        with PROFILER.timer('resolve'):
+            real_root = Path(os.path.realpath(search_path))
+        stack = [(search_path, real_root)]
+        while stack:
+            logical_dir, real_dir = stack.pop()
+            try:
+                with PROFILER.timer('stat'):
+                    st = os.stat(real_dir)
+            except OSError:
+                continue
+            self.dir_aliases.setdefault(real_dir, []).append(logical_dir)
+            key = (st.st_dev, st.st_ino)
+            if key in self.visited:
+                continue
+            self.visited.add(key)
+            self.dir_mtimes[real_dir] = st.st_mtime_ns
+
+            try:
+                with PROFILER.timer('walk'):
+                    entries = list(os.scandir(real_dir))
+            except OSError as e:
+                log.warning(f"Could not list {logical_dir}: {e}")
+                continue
+
+            subdirs = []
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    continue
+                if is_dir:
+                    # Skip build/output directories
+                    if entry.name in SKIP_DIRS:
+                        continue
+                    subdirs.append(entry)
+                elif entry.name.endswith('.adoc'):
+                    yield logical_dir / entry.name, self._real_path(entry, real_dir)
+
+            for entry in reversed(subdirs):
+                stack.append((logical_dir / entry.name, self._real_path(entry, real_dir)))
+
+    @staticmethod
+    def _real_path(entry: os.DirEntry, real_dir: Path) -> Path:
+        if entry.is_symlink():
+            with PROFILER.timer('resolve'):
+                return Path(os.path.realpath(entry.path))
+        return real_dir / entry.name
+
+    def logical_paths(self, path: Path) -> List[Path]:
+        """
+        Return the logical paths a resolved file was reached through, one
+        for each path the walker entered its directory (or an ancestor) by.
+        """
+        found: List[Path] = []
+        for ancestor in path.parents:
+            aliases = self.dir_aliases.get(ancestor)
+            if aliases:
+                rest = path.relative_to(ancestor)
+                for alias in aliases:
+                    candidate = alias / rest
+                    if candidate not in found:
+                        found.append(candidate)
+        return found
+
+
+def walk_adoc_files(search_path: Path) -> Iterator[Path]:
+    """Yield every .adoc path below search_path, following symlinks."""
+    for filepath, _ in TreeWalker().walk(search_path):
+        yield filepath
+
+
+def _parse_task(task: Tuple[Path, Path, bool, Optional[dict]]) -> Tuple[CorpusFile, bool]:
+    """Unpack a scan task for parse_adoc_file (module level so it pickles)."""
+    return parse_adoc_file(*task)
+
+
+def scan_corpus(base_dir: Path, include_all_dirs: bool = True, use_cache: bool = False,
+                jobs: int = 1) -> Corpus:
+    """
+    Scan the documentation tree once and build the shared corpus model.
+
+    Args:
+        base_dir: Base directory to search
+        include_all_dirs: If True, search all subdirectories; otherwise only
+            docs/topics and assemblies
+        use_cache: If True, reuse and refresh the on-disk cache in
+            .snippet-cache/ so unchanged files are only stat()ed
+        jobs: Number of worker processes used to parse files
+    """
+    corpus = Corpus(base_dir)
+    for _ in iter_scan_corpus(corpus, include_all_dirs, use_cache, jobs):
+        pass
+    return corpus
+
+
+def iter_scan_corpus(corpus: Corpus, include_all_dirs: bool = True, use_cache: bool = False,
+                     jobs: int = 1) -> Iterator[CorpusFile]:
+    """
+    Fill corpus by scanning its base directory, yielding each entry as soon
+    as it has been parsed.
+
+    docs/ and assemblies/ are walked first so that files found there are
+    flagged as part of the documentation tree (the files whose includes
+    count as snippet usage); the rest of base_dir is walked afterwards
+    for snippet discovery only.
+
+    Walking is serial; reading and parsing the files can be fanned out to
+    a process pool. Results are merged in walk order, so the corpus is
+    identical whatever the number of jobs.
+    """
+    base_dir = corpus.base_dir
+    cache = load_corpus_cache(base_dir) if use_cache else {}
+    search_paths = [
+        (base_dir / DEFAULT_DOCS_DIR, True),
+        (base_dir / DEFAULT_ASSEMBLIES_DIR, True),
+    ]
+    if include_all_dirs:
+        search_paths.append((base_dir, False))
+    else:
+        search_paths[0] = (base_dir / DEFAULT_TOPICS_DIR, True)
+
+    def tasks() -> Iterator[Tuple[Path, Path, bool, Optional[dict]]]:
+        seen: Set[Path] = set()
+        for search_path, in_docs_tree in search_paths:
+            if not search_path.exists():
+                continue
+
+            for filepath, resolved_path in corpus.walker.walk(search_path):
+                # Skip already-processed files (handles file symlinks)
+                if resolved_path in seen:
+                    continue
+                seen.add(resolved_path)
+
+                cached = cache.get(cache_key(base_dir, resolved_path))
+                yield (filepath, resolved_path, in_docs_tree, cached)
+
+    # Records that changed this run, and how many files can be cached at
+    # all; unreadable files are never cached, so they do not count
+    refreshed = cacheable = 0
+
+    def add_results(results: Iterator[Tuple[CorpusFile, bool]], in_workers: bool) -> Iterator[CorpusFile]:
+        nonlocal refreshed, cacheable
+        for entry, was_read in results:
+            corpus.files[entry.path] = entry
+            if was_read:
+                corpus.parsed_count += 1
+                corpus.bytes_read += entry.size
+                if in_workers:
+                    PROFILER.count_read(entry.size)
+            if entry.readable:
+                cacheable += 1
+                refreshed += was_read
+            yield entry
+
+    if jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        task_list = list(tasks())
+        chunksize = max(1, len(task_list) // (jobs * 4))
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            yield from add_results(pool.map(_parse_task, task_list, chunksize=chunksize), True)
+    else:
+        yield from add_results(map(_parse_task, tasks()), False)
+
+    log.debug(f"Scanned {len(corpus.files)} file(s), read {corpus.parsed_count}")
+
+    if use_cache and (refreshed or len(cache) != cacheable):
+        save_corpus_cache(corpus)
+
+
+def find_snippet_files(base_dir: Path, include_all_dirs: bool = True,
+                       corpus: Optional[Corpus] = None) -> List[Path]:
+    """
+    Find all snippet files in the documentation directory.
+    
+    Snippets are identified by:
+    - Filename containing 'snippet' pattern (snippet_*, snippet-*, *-snippet.adoc)
+    - Being in a 'snippets/' directory
+    - Containing snippet content-type headers
+    - Starting with `// snippet` comment
+    
+    Args:
+        base_dir: Base directory to search
+        include_all_dirs: If True, search all subdirectories; otherwise only docs/topics
+        corpus: Previously scanned corpus to reuse instead of scanning again
+    """
+    if corpus is None:
+        corpus = scan_corpus(base_dir, include_all_dirs)
+    return corpus.snippets()
@@ -0,0 +1,409 @@
+"""
+Detection of duplicated content blocks and their extraction into snippets.
+"""
+
+import functools
+import hashlib
+import logging
+import os
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterator, List, Optional, Set, Tuple
+
+from .common import (
+    ATTRIBUTE_DEF_RE, BLOCK_DELIMITER_RE, CONDITIONAL_RE, CONTENT_TYPE_RE, ENDIF_RE,
+    MAX_SHINGLE_POSTINGS, PROFILER, SECTION_TITLE_RE, SHINGLE_SIZE, SNIPPET_HEADER,
+    display_path, read_text, write_file_atomic,
+)
+from .corpus import Corpus
+from .graph import IncludeGraph
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class ContentBlock:
+    """A paragraph or delimited block of one file, as found by split_content_blocks()."""
+    path: Path
+    start: int  # First line, 1-based
+    end: int  # Last line, inclusive
+    lines: List[str]
+    normalized: str
+    digest: str
+    heading_level: Optional[int] = None  # Lowest section level among its titles
+
+    @property
+    def body(self) -> Tuple[str, ...]:
+        """
+        The raw lines extract would move into a snippet: without the block
+        IDs that open the block, and with section titles stripped of their
+        level, which the include's leveloffset restores.
+        """
+        return tuple(
+            match.group(2) if match else line
+            for line, match in ((line, SECTION_TITLE_RE.match(line))
+                                for line in self.lines[leading_anchor_count(self):])
+        )
+
+
+@dataclass
+class BlockCluster:
+    """Blocks whose normalized content is identical or similar enough to share."""
+    id: str
+    blocks: List[ContentBlock]
+    similarity: float  # Lowest pairwise similarity that joined the cluster
+
+    @property
+    def line_count(self) -> int:
+        return max(block.end - block.start + 1 for block in self.blocks)
+
+    @functools.cached_property
+    def representative(self) -> ContentBlock:
+        """The first block with the raw text that occurs most often."""
+        counts = Counter(block.body for block in self.blocks)
+        return max(self.blocks, key=lambda block: counts[block.body])
+
+    def is_exact(self, block: ContentBlock) -> bool:
+        """Return True if block has the same raw text as the representative."""
+        return block.body == self.representative.body
+
+    def record(self, base_dir: Path) -> dict:
+        """Return the output record describing this cluster."""
+        return {
+            'type': 'cluster',
+            'id': self.id,
+            'occurrences': len(self.blocks),
+            'lines': self.line_count,
+            'similarity': round(self.similarity, 3),
+            'preview': self.representative.lines[0].strip(),
+            'locations': [
+                {'path': str(display_path(block.path, base_dir)), 'start': block.start,
+                 'end': block.end, 'exact': self.is_exact(block)}
+                for block in self.blocks
+            ],
+        }
+
+
+def is_anchor_line(line: str) -> bool:
+    """Return True for a block ID line such as [id="..."] or [[...]]."""
+    return line.lstrip().startswith(('[[', '[id='))
+
+
+def is_directive_line(line: str) -> bool:
+    """Return True for attribute entries, includes and conditionals."""
+    stripped = line.strip()
+    return bool(ATTRIBUTE_DEF_RE.match(stripped) or stripped.startswith('include::')
+                or CONDITIONAL_RE.match(stripped) or ENDIF_RE.match(stripped))
+
+
+def normalize_block_line(line: str) -> Optional[str]:
+    """
+    Normalize one line for duplicate detection.
+
+    Case and whitespace are folded and section titles lose their level, so
+    the same text at different heading depths compares equal. Returns None
+    for lines that differ between copies by design: comments, block IDs
+    and content-type headers.
+    """
+    stripped = line.strip()
+    if not stripped or stripped.startswith('//') or is_anchor_line(stripped):
+        return None
+    if CONTENT_TYPE_RE.match(stripped):
+        return None
+    match = SECTION_TITLE_RE.match(stripped)
+    if match:
+        stripped = '=' + match.group(2)
+    return ' '.join(stripped.lower().split())
+
+
+def split_content_blocks(path: Path, content: str) -> List[ContentBlock]:
+    """
+    Split a file into blocks separated by blank lines or section titles.
+
+    A delimited block (listing, example, sidebar and so on) is kept whole,
+    blank lines included, together with the title and attribute lines
+    directly above it. A section title starts a new block that keeps the
+    block IDs directly above the title. Blocks made only of attribute
+    entries, includes and conditionals are skipped.
+    """
+    blocks: List[ContentBlock] = []
+    lines = content.split('\n')
+    current: List[str] = []
+    start = 1
+    delimiter: Optional[str] = None
+    comment = False  # Comment blocks are never reported
+
+    def flush() -> None:
+        if current and not comment and not all(map(is_directive_line, current)):
+            normalized = [n for n in map(normalize_block_line, current) if n is not None]
+            if normalized:
+                text = '\n'.join(normalized)
+                levels = [len(m.group(1)) - 1 for m in map(SECTION_TITLE_RE.match, current) if m]
+                blocks.append(ContentBlock(
+                    path, start, start + len(current) - 1, list(current), text,
+                    hashlib.sha1(text.encode('utf-8')).hexdigest(),
+                    min(levels) if levels else None,
+                ))
+        current.clear()
+
+    for number, line in enumerate(lines, 1):
+        stripped = line.rstrip()
+        if delimiter is not None:
+            current.append(line)
+            if stripped == delimiter:
+                delimiter = None
+            continue
+        if not stripped:
+            flush()
+            continue
+        if SECTION_TITLE_RE.match(stripped) and not all(map(is_anchor_line, current)):
+            flush()
+        if not current:
+            start = number
+            comment = False
+        current.append(line)
+        if BLOCK_DELIMITER_RE.match(stripped):
+            delimiter = stripped
+            comment = comment or stripped.startswith('/')
+    flush()
+    return blocks
+
+
+def block_shingles(text: str, size: int = SHINGLE_SIZE) -> FrozenSet[int]:
+    """Return the hashes of every run of `size` consecutive words in text."""
+    words = re.findall(r'\w+', text)
+    if len(words) <= size:
+        return frozenset((hash(tuple(words)),))
+    return frozenset(hash(tuple(words[i:i + size])) for i in range(len(words) - size + 1))
+
+
+class BlockIndex:
+    """
+    Content-addressed index of the blocks of a corpus.
+
+    Blocks are grouped by the digest of their normalized text, so exact
+    duplicates cost nothing extra. Near duplicates are found through an
+    inverted index from word shingles to distinct blocks: only blocks that
+    share a shingle are ever compared, and shingles so common that they
+    appear in more than MAX_SHINGLE_POSTINGS blocks are not used to pick
+    candidates, which keeps the work close to linear in the corpus size.
+    """
+
+    def __init__(self, min_lines: int = 3, min_chars: int = 80):
+        self.min_lines = min_lines
+        self.min_chars = min_chars
+        self.by_digest: Dict[str, List[ContentBlock]] = {}
+        self.shingles: Dict[str, FrozenSet[int]] = {}
+        self.postings: Dict[int, List[str]] = defaultdict(list)
+
+    def add_file(self, path: Path, content: str) -> None:
+        """Index the blocks of one file that meet the size threshold."""
+        for block in split_content_blocks(path, content):
+            if block.end - block.start + 1 < self.min_lines or len(block.normalized) < self.min_chars:
+                continue
+            occurrences = self.by_digest.setdefault(block.digest, [])
+            occurrences.append(block)
+            if len(occurrences) == 1:
+                shingles = block_shingles(block.normalized)
+                self.shingles[block.digest] = shingles
+                for shingle in shingles:
+                    self.postings[shingle].append(block.digest)
+
+    def _similar_pairs(self, similarity: float) -> Iterator[Tuple[str, str, float]]:
+        for digest, shingles in self.shingles.items():
+            candidates: Set[str] = set()
+            for shingle in shingles:
+                posting = self.postings[shingle]
+                if len(posting) <= MAX_SHINGLE_POSTINGS:
+                    candidates.update(posting)
+            for other in candidates:
+                if other <= digest:
+                    continue
+                other_shingles = self.shingles[other]
+                shared = len(shingles & other_shingles)
+                score = shared / (len(shingles) + len(other_shingles) - shared)
+                if score >= similarity:
+                    yield digest, other, score
+
+    def clusters(self, similarity: float = 1.0, min_occurrences: int = 2) -> List[BlockCluster]:
+        """
+        Group duplicated blocks into clusters.
+
+        With similarity 1.0 only blocks with identical normalized text are
+        grouped; lower values also join blocks whose shingle sets have at
+        least that Jaccard similarity. Clusters are sorted with the most
+        duplicated lines first.
+        """
+        parent = {digest: digest for digest in self.by_digest}
+        scores: Dict[str, float] = {}
+
+        def find(digest: str) -> str:
+            while parent[digest] != digest:
+                parent[digest] = parent[parent[digest]]
+                digest = parent[digest]
+            return digest
+
+        if similarity < 1.0:
+            for a, b, score in self._similar_pairs(similarity):
+                root_a, root_b = find(a), find(b)
+                if root_a != root_b:
+                    parent[root_b] = root_a
+                    scores[root_a] = min(score, scores.get(root_a, 1.0), scores.get(root_b, 1.0))
+
+        groups: Dict[str, List[str]] = defaultdict(list)
+        for digest in self.by_digest:
+            groups[find(digest)].append(digest)
+
+        clusters = []
+        for root, digests in groups.items():
+            # The most frequent variant comes first and names the cluster
+            digests.sort(key=lambda d: (-len(self.by_digest[d]), d))
+            blocks = [block for digest in digests for block in self.by_digest[digest]]
+            if len(blocks) < min_occurrences:
+                continue
+            clusters.append(BlockCluster(digests[0][:12], blocks, scores.get(root, 1.0)))
+        clusters.sort(key=lambda c: (-len(c.blocks) * c.line_count, c.id))
+        return clusters
+
+
+def build_block_index(corpus: Corpus, min_lines: int = 3, min_chars: int = 80) -> BlockIndex:
+    """Index the content blocks of every readable file under docs/ and assemblies/."""
+    index = BlockIndex(min_lines, min_chars)
+    for entry in corpus.docs_files():
+        if not entry.readable:
+            continue
+        try:
+            content = read_text(entry.path)
+        except (OSError, UnicodeDecodeError) as e:
+            log.warning(f"Could not read {entry.path}: {e}")
+            continue
+        with PROFILER.timer('regex'):
+            index.add_file(entry.path, content)
+    return index
+
+
+def include_target_for(source_dir: Path, target: Path) -> Optional[str]:
+    """
+    Return the include:: target that reaches target from a file in source_dir.
+
+    A topics/ symlink next to the file is preferred, as the assemblies and
+    master.adoc files do; otherwise the relative path is used. Returns None
+    if no candidate resolves back to target.
+    """
+    candidates = []
+    topics_link = source_dir / 'topics'
+    if topics_link.is_dir():
+        topics_root = Path(os.path.realpath(topics_link))
+        if topics_root in target.parents:
+            candidates.append((Path('topics') / target.relative_to(topics_root)).as_posix())
+    candidates.append(Path(os.path.relpath(target, os.path.realpath(source_dir))).as_posix())
+    for candidate in candidates:
+        if Path(os.path.realpath(source_dir / candidate)) == target:
+            return candidate
+    return None
+
+
+def leading_anchor_count(block: ContentBlock) -> int:
+    """Return how many block ID lines open the block; they stay in place on extract."""
+    count = 0
+    for line in block.lines:
+        if not is_anchor_line(line):
+            break
+        count += 1
+    return count
+
+
+@dataclass
+class ExtractPlan:
+    """The snippet file to create and the line ranges to replace in each file."""
+    snippet: Path
+    content: str
+    # {file: [(first line, last line, replacement line)]}, 1-based and inclusive
+    replacements: Dict[Path, List[Tuple[int, int, str]]] = field(default_factory=dict)
+    errors: List[str] = field(default_factory=list)
+    skipped: List[ContentBlock] = field(default_factory=list)
+
+
+def build_extract_plan(cluster: BlockCluster, snippet: Path, corpus: Corpus,
+                       graph: IncludeGraph) -> ExtractPlan:
+    """
+    Plan replacing the blocks of a cluster with an include of a new snippet.
+
+    The snippet takes the content of the cluster's representative block,
+    with includes inside it re-targeted relative to the snippet. Only
+    blocks whose raw text is identical to it are replaced; the others
+    (near duplicates, or copies differing in case or spacing) are listed
+    in `skipped` and left alone, and fewer than two identical blocks is
+    an error. Block IDs
+    above each occurrence stay in the including file. Each include carries
+    the leveloffset between the occurrence's section level and the
+    snippet's, so titles render at the depth they had before.
+    """
+    representative = cluster.representative
+    body = representative.lines[leading_anchor_count(representative):]
+    edges = {edge.directive.line_number: edge for edge in graph.includes_of(representative.path)}
+    first_line = representative.start + leading_anchor_count(representative)
+    plan = ExtractPlan(snippet, '')
+
+    lines = []
+    for number, line in enumerate(body, first_line):
+        edge = edges.get(number)
+        if edge is not None and edge.target is not None:
+            target = include_target_for(snippet.parent, edge.target)
+            if target is None or '{' in edge.directive.target:
+                plan.errors.append(f"{representative.path}:{number}: cannot re-target "
+                                   f"{edge.directive.target} from {snippet.parent}")
+            else:
+                line = f"include::{target}[{edge.directive.options}]"
+        lines.append(line)
+    plan.content = f"{SNIPPET_HEADER}\n\n" + '\n'.join(lines) + '\n'
+
+    for block in cluster.blocks:
+        if not cluster.is_exact(block):
+            plan.skipped.append(block)
+            continue
+        entry = corpus.files[block.path]
+        target = include_target_for(entry.logical_path.parent, snippet)
+        if target is None:
+            plan.errors.append(f"{block.path}: no include path reaches {snippet}")
+            continue
+        options = ''
+        if block.heading_level is not None and representative.heading_level is not None:
+            offset = block.heading_level - representative.heading_level
+            if offset:
+                options = f"leveloffset={offset:+d}"
+        plan.replacements.setdefault(block.path, []).append(
+            (block.start + leading_anchor_count(block), block.end, f"include::{target}[{options}]"))
+    if len(cluster.blocks) - len(plan.skipped) < 2:
+        plan.errors.append(f"Cluster {cluster.id} has fewer than two blocks identical to "
+                           f"{representative.path}:{representative.start}-{representative.end}")
+    return plan
+
+
+def apply_extract_plan(plan: ExtractPlan, dry_run: bool = False) -> int:
+    """
+    Write the snippet and rewrite each including file with one atomic write.
+
+    Returns the number of replaced blocks.
+    """
+    if not dry_run:
+        plan.snippet.parent.mkdir(parents=True, exist_ok=True)
+        write_file_atomic(plan.snippet, plan.content)
+        log.info(f"Created {plan.snippet}")
+
+    replaced_count = 0
+    for path, ranges in plan.replacements.items():
+        content = read_text(path)
+        lines = content.split('\n')
+        # Replace from the bottom up so earlier line numbers stay valid
+        for start, end, include in sorted(ranges, reverse=True):
+            lines[start - 1:end] = [include]
+        replaced_count += len(ranges)
+        if dry_run:
+            log.info(f"Would replace {len(ranges)} block(s) in {path}")
+            continue
+        write_file_atomic(path, '\n'.join(lines))
+        log.info(f"Replaced {len(ranges)} block(s) in {path}")
+    return replaced_count
@@ -0,0 +1,190 @@
+"""
+Flattening a guide into a single file with every include expanded.
+"""
+
+import logging
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .common import (
+    ATTRIBUTE_DEF_RE, LINE_TEXT, LINE_TITLE, PROFILER, TAG_DIRECTIVE_RE, open_atomic,
+    read_text,
+)
+from .graph import IncludeEdge, IncludeGraph
+from .corpus import BlockTokenizer
+from .inline import parse_include_options, resolve_leveloffset, shift_section_title
+
+log = logging.getLogger(__name__)
+
+
+def parse_line_ranges(spec: str) -> List[Tuple[int, Optional[int]]]:
+    """Parse a lines= include option such as 1..5;8;10..-1 into 1-based ranges."""
+    ranges: List[Tuple[int, Optional[int]]] = []
+    for part in re.split(r'[;,]', spec):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            if '..' in part:
+                start, end = part.split('..', 1)
+                stop = int(end) if end.strip() else -1
+                ranges.append((int(start), None if stop < 0 else stop))
+            else:
+                ranges.append((int(part), int(part)))
+        except ValueError:
+            log.warning(f"Ignoring invalid line range: {part}")
+    return ranges
+
+
+def select_include_lines(lines: List[str], options: Dict[str, str]) -> Iterator[Tuple[int, str]]:
+    """
+    Yield the (line number, line) pairs an include with these options keeps.
+
+    lines= takes precedence over tag=/tags=, as in Asciidoctor. Tag
+    selections support names, !name exclusions and the * and ** wildcards;
+    tag:: and end:: directive lines themselves are never kept.
+    """
+    if 'lines' in options:
+        ranges = parse_line_ranges(options['lines'])
+        for number, line in enumerate(lines, 1):
+            if any(start <= number and (stop is None or number <= stop) for start, stop in ranges):
+                yield number, line
+        return
+
+    spec = options.get('tags', options.get('tag'))
+    if spec is None:
+        yield from enumerate(lines, 1)
+        return
+
+    names = [name.strip() for name in re.split(r'[;,]', spec) if name.strip()]
+    wanted = {name for name in names if not name.startswith('!') and name not in ('*', '**')}
+    excluded = {name[1:] for name in names if name.startswith('!') and name not in ('!*', '!**')}
+    keep_untagged = '**' in names or not (wanted or '*' in names)
+    keep_tagged = '*' in names or '**' in names or keep_untagged
+    active: List[str] = []
+    for number, line in enumerate(lines, 1):
+        directive = TAG_DIRECTIVE_RE.search(line) if '::' in line else None
+        if directive is not None:
+            kind, name = directive.groups()
+            if kind == 'tag':
+                active.append(name)
+            elif name in active:
+                del active[len(active) - 1 - active[::-1].index(name)]
+            continue
+        if any(name in excluded for name in active):
+            continue
+        if not active:
+            keep = keep_untagged
+        else:
+            keep = keep_tagged or any(name in wanted for name in active)
+        if keep:
+            yield number, line
+
+
+@dataclass
+class FlattenResult:
+    """Statistics for one flattened guide."""
+    master: Path
+    output: Optional[Path] = None
+    lines: int = 0
+    includes: int = 0
+    unresolved: List[Tuple[Path, int, str]] = field(default_factory=list)
+
+
+class Flattener:
+    """
+    Expands every include of a master.adoc into one resolved document.
+
+    Include edges come from the shared IncludeGraph, so guides that pull in
+    the same topics reuse the same parsed and resolved edges. Each file is
+    read only while it is being expanded and lines are written out as they
+    are produced, so memory stays proportional to the include depth rather
+    than the size of the guide.
+    """
+
+    def __init__(self, graph: IncludeGraph):
+        self.graph = graph
+        self.corpus = graph.corpus
+
+    def flatten(self, master: Path, output) -> FlattenResult:
+        """Write the flattened master to the open text stream output."""
+        result = FlattenResult(master)
+        self._expand(master, master, 0, {}, [master], output, result)
+        return result
+
+    def _target(self, edge: IncludeEdge, master: Path) -> Optional[Path]:
+        if '{' in edge.directive.target:
+            return self.graph.resolve(self.corpus.files[edge.source], edge.directive.target, master)
+        return edge.target
+
+    def _expand(self, path: Path, master: Path, offset: Optional[int], options: Dict[str, str],
+                stack: List[Path], output, result: FlattenResult) -> None:
+        """
+        Expand one file. offset is None when the file is included inside a
+        verbatim block, where its lines are copied without interpretation.
+        """
+        content = read_text(path)
+        lines = content.split('\n')
+        if content.endswith('\n'):
+            lines.pop()
+        edges = {edge.directive.line_number: edge for edge in self.graph.includes_of(path)}
+        parseable = offset is not None and path in self.graph.edges
+        base_offset = offset
+        tokenizer = BlockTokenizer()
+
+        for number, line in select_include_lines(lines, options):
+            edge = edges.get(number)
+            if edge is not None:
+                # Includes are preprocessed everywhere, even in listing blocks
+                child_offset = None if tokenizer.in_verbatim or not parseable else offset
+                self._expand_include(edge, master, child_offset, stack, output, result)
+                continue
+            if parseable:
+                kind = tokenizer.classify(line)
+                if kind == LINE_TEXT and line.startswith(':'):
+                    match = ATTRIBUTE_DEF_RE.match(line)
+                    if match and match.group(2) == 'leveloffset':
+                        if match.group(1) or match.group(3):
+                            offset = base_offset
+                        else:
+                            offset = resolve_leveloffset(offset, match.group(4))
+                        continue
+                elif kind == LINE_TITLE and offset:
+                    line = shift_section_title(line, offset)
+            output.write(line + '\n')
+            result.lines += 1
+
+    def _expand_include(self, edge: IncludeEdge, master: Path, offset: Optional[int],
+                        stack: List[Path], output, result: FlattenResult) -> None:
+        directive = edge.directive
+        target = self._target(edge, master)
+        if target is None or not target.is_file() or target in stack:
+            reason = 'include cycle' if target in stack else 'unresolved include'
+            log.warning(f"{edge.source}:{directive.line_number}: {reason}: {directive.target}")
+            result.unresolved.append((edge.source, directive.line_number, directive.target))
+            output.write(directive.text + '\n')
+            result.lines += 1
+            return
+
+        options = parse_include_options(directive.options)
+        if 'leveloffset' in options and offset is not None:
+            offset = resolve_leveloffset(offset, options['leveloffset'])
+        result.includes += 1
+        stack.append(target)
+        try:
+            self._expand(target, master, offset, options, stack, output, result)
+        finally:
+            stack.pop()
+
+
+def flatten_guide(flattener: Flattener, master: Path, output_path: Path) -> FlattenResult:
+    """Flatten one master.adoc into output_path, replacing it atomically."""
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open_atomic(output_path) as output:
+        result = flattener.flatten(master, output)
+        written = output.tell()
+    PROFILER.count_write(written)
+    result.output = output_path
+    return result
@@ -0,0 +1,683 @@
+"""
+Attribute resolution, the resolved include graph and per-variant
+evaluation of conditionals.
+"""
+
+import logging
+import os
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from .common import (
+    ATTRIBUTE_DEF_RE, ATTRIBUTE_REF_RE, CONDITIONAL_RE, DEFAULT_ATTRIBUTES_FILE,
+    DEFAULT_DOCS_DIR, ENDIF_RE, IFEVAL_RE, INCLUDE_RE, MASTER_FILENAME, PROFILER, REF_SET,
+    REF_UNSET, read_text,
+)
+from .corpus import Corpus, CorpusFile, IncludeDirective, scan_corpus
+
+log = logging.getLogger(__name__)
+
+# Reference events that steer a variant walk, besides include directives
+STRUCTURE_KINDS = frozenset(('ifdef', 'ifndef', 'ifeval', 'endif', REF_SET, REF_UNSET))
+
+
+def expand_attributes(text: str, attributes: Dict[str, str]) -> str:
+    """Replace {name} references with known attribute values, leaving unknown ones as-is."""
+    if '{' not in text:
+        return text
+    return ATTRIBUTE_REF_RE.sub(lambda m: attributes.get(m.group(1), m.group(0)), text)
+
+
+def is_attributes_file(path: Path) -> bool:
+    """Check if an include target is an attribute definition file."""
+    return path.name.endswith('attributes.adoc')
+
+
+def evaluate_ifeval(expression: str, attributes: Dict[str, str]) -> Optional[bool]:
+    """
+    Evaluate an ifeval expression such as {ProductVersion} >= 7 or
+    "{context}" == "cli-guide". Operands are compared as numbers when both
+    are numeric and as strings otherwise. Returns None if the expression
+    cannot be parsed.
+    """
+    match = IFEVAL_RE.match(expand_attributes(expression, attributes))
+    if not match:
+        return None
+    left, operator, right = match.groups()
+    values = [value.strip().strip('"\'') for value in (left, right)]
+    try:
+        values = [float(value) for value in values]
+    except ValueError:
+        pass
+    a, b = values
+    return {
+        '==': a == b, '!=': a != b,
+        '<': a < b, '<=': a <= b, '>': a > b, '>=': a >= b,
+    }[operator]
+
+
+def evaluate_ifdef(kind: str, names: str, attributes: Dict[str, str],
+                   expression: str = '') -> Optional[bool]:
+    """
+    Evaluate an ifdef/ifndef/ifeval condition against an attribute table.
+
+    `a,b` is true if any attribute is set and `a+b` if all are. ifeval
+    evaluates its bracketed expression and returns None if it cannot.
+    """
+    if kind == 'ifeval':
+        return evaluate_ifeval(expression, attributes)
+    if '+' in names:
+        result = all(name in attributes for name in names.split('+'))
+    else:
+        result = any(name in attributes for name in names.split(','))
+    return result if kind == 'ifdef' else not result
+
+
+class AttributeResolver:
+    """
+    Expands {name} references in include targets.
+
+    Attribute definition files are read once per run. Each master.adoc
+    gets its own table, built from the attributes the master sets itself
+    (such as :mta: or :context:) and the definition files it includes,
+    with ifdef/ifndef blocks evaluated against what is set so far. The
+    table used outside of any master is document-attributes.adoc on its
+    own. Expansions are cached per (master, target) pair.
+    """
+
+    def __init__(self, base_dir: Path):
+        self.base_dir = base_dir
+        self._lines: Dict[Path, List[str]] = {}
+        self._tables: Dict[Optional[Path], Dict[str, str]] = {}
+        self._expanded: Dict[Tuple[Optional[Path], str], str] = {}
+
+    def _read_lines(self, path: Path) -> List[str]:
+        if path not in self._lines:
+            try:
+                self._lines[path] = read_text(path).splitlines()
+            except OSError as e:
+                log.debug(f"No attributes loaded from {path}: {e}")
+                self._lines[path] = []
+        return self._lines[path]
+
+    def _apply_file(self, path: Path, attributes: Dict[str, str], depth: int = 0) -> None:
+        """Apply the attribute entries of a file, following included definition files."""
+        active: List[bool] = []
+        for line in self._read_lines(path):
+            conditional = CONDITIONAL_RE.match(line)
+            if conditional:
+                kind, names, inline_text = conditional.groups()
+                result = evaluate_ifdef(kind, names, attributes, inline_text) is True
+                if inline_text and kind != 'ifeval':
+                    # Single-line form: ifdef::name[text]
+                    if result and all(active):
+                        self._apply_line(inline_text, path, attributes, depth)
+                    continue
+                active.append(result)
+                continue
+            if ENDIF_RE.match(line):
+                if active:
+                    active.pop()
+                continue
+            if all(active):
+                self._apply_line(line, path, attributes, depth)
+
+    def _apply_line(self, line: str, path: Path, attributes: Dict[str, str], depth: int) -> None:
+        definition = ATTRIBUTE_DEF_RE.match(line)
+        if definition:
+            unset_before, name, unset_after, value = definition.groups()
+            if unset_before or unset_after:
+                attributes.pop(name, None)
+            else:
+                attributes[name] = expand_attributes(value, attributes)
+            return
+
+        include = INCLUDE_RE.match(line)
+        if include and depth < 8:
+            target = Path(os.path.realpath(path.parent / expand_attributes(include.group(1), attributes)))
+            if is_attributes_file(target):
+                self._apply_file(target, attributes, depth + 1)
+
+    def table(self, master: Optional[Path] = None) -> Dict[str, str]:
+        """Return the attribute table in effect for a master (or outside any master)."""
+        if master not in self._tables:
+            attributes: Dict[str, str] = {}
+            if master is None:
+                self._apply_file(self.base_dir / DEFAULT_ATTRIBUTES_FILE, attributes)
+            else:
+                self._apply_file(master, attributes)
+            self._tables[master] = attributes
+        return self._tables[master]
+
+    def expand(self, target: str, master: Optional[Path] = None) -> str:
+        """Expand the attribute references in an include target."""
+        if '{' not in target:
+            return target
+        key = (master, target)
+        if key not in self._expanded:
+            self._expanded[key] = expand_attributes(target, self.table(master))
+        return self._expanded[key]
+
+
+@dataclass(frozen=True)
+class IncludeEdge:
+    """An include directive together with the resolved path it points to."""
+    source: Path
+    directive: IncludeDirective
+    target: Optional[Path]  # None for URL includes
+
+
+class IncludeGraph:
+    """
+    Resolved include graph over the corpus.
+
+    Include targets are expanded with the document attributes and resolved
+    relative to the including file, following symlinked topics/ and
+    assemblies/ directories, so every edge points at a resolved path.
+    Targets whose attributes differ per guide can be re-resolved for a
+    specific master with resolve_for_masters().
+    Strongly connected components are computed once, which gives cycle
+    detection and lets reachability queries be memoized per component.
+    """
+
+    def __init__(self, corpus: Corpus, resolver: Optional[AttributeResolver] = None):
+        self.corpus = corpus
+        self.resolver = resolver if resolver is not None else AttributeResolver(corpus.base_dir)
+        self.edges: Dict[Path, List[IncludeEdge]] = {}
+        self.reverse: Dict[Path, List[IncludeEdge]] = {}
+
+        for entry in corpus.files.values():
+            self._add_edges(entry)
+
+        self._compute_components()
+        self._descendants: Dict[int, frozenset] = {}
+        self._ancestors: Dict[int, frozenset] = {}
+
+    def _add_edges(self, entry: CorpusFile) -> None:
+        out = []
+        for include in entry.includes:
+            edge = IncludeEdge(entry.path, include, self.resolve(entry, include.target))
+            out.append(edge)
+            if edge.target is not None:
+                self.reverse.setdefault(edge.target, []).append(edge)
+        self.edges[entry.path] = out
+
+    def update_file(self, path: Path) -> Set[Path]:
+        """
+        Re-read the edges of one file from the corpus after it changed.
+
+        A file no longer in the corpus loses its edges. Components and
+        reachability memos are recomputed, which is linear in the graph.
+        Returns the targets of the file's old and new edges.
+        """
+        touched: Set[Path] = set()
+        for edge in self.edges.pop(path, []):
+            if edge.target is not None:
+                touched.add(edge.target)
+                incoming = self.reverse[edge.target]
+                incoming[:] = [e for e in incoming if e.source != path]
+        entry = self.corpus.get(path)
+        if entry is not None:
+            self._add_edges(entry)
+            touched.update(edge.target for edge in self.edges[path] if edge.target is not None)
+
+        self._compute_components()
+        self._descendants.clear()
+        self._ancestors.clear()
+        return touched
+
+    def resolve(self, entry: CorpusFile, target: str, master: Optional[Path] = None) -> Optional[Path]:
+        """Resolve an include target as written in the given file."""
+        expanded = self.resolver.expand(target.strip(), master)
+        if '://' in expanded:
+            return None
+        with PROFILER.timer('resolve'):
+            return Path(os.path.realpath(entry.logical_path.parent / expanded))
+
+    def resolve_for_masters(self, edge: IncludeEdge) -> List[Tuple[Optional[Path], Optional[Path]]]:
+        """
+        Resolve an edge once per master.adoc that pulls in its source file.
+
+        Returns (master, target) pairs; targets without attribute references
+        resolve the same everywhere and yield a single (None, target) pair.
+        """
+        if '{' not in edge.directive.target:
+            return [(None, edge.target)]
+        masters = self.masters_including(edge.source)
+        if edge.source.name == MASTER_FILENAME:
+            masters.append(edge.source)
+        if not masters:
+            return [(None, edge.target)]
+        entry = self.corpus.files[edge.source]
+        return [(master, self.resolve(entry, edge.directive.target, master)) for master in masters]
+
+    def includes_of(self, path: Path) -> List[IncludeEdge]:
+        """Return the include edges going out of a file, in line order."""
+        return self.edges.get(path, [])
+
+    def included_by(self, path: Path) -> List[IncludeEdge]:
+        """Return the include edges pointing at a file, in scan order."""
+        return self.reverse.get(path, [])
+
+    def _successors(self, path: Path) -> Iterator[Path]:
+        for edge in self.edges.get(path, ()):
+            if edge.target in self.edges:
+                yield edge.target
+
+    def _compute_components(self) -> None:
+        """Compute strongly connected components with an iterative Tarjan."""
+        index: Dict[Path, int] = {}
+        lowlink: Dict[Path, int] = {}
+        on_stack: Set[Path] = set()
+        stack: List[Path] = []
+        self.components: List[List[Path]] = []
+        self.component_of: Dict[Path, int] = {}
+
+        for root in self.edges:
+            if root in index:
+                continue
+            work = [(root, self._successors(root))]
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, successors = work[-1]
+                for succ in successors:
+                    if succ not in index:
+                        index[succ] = lowlink[succ] = len(index)
+                        stack.append(succ)
+                        on_stack.add(succ)
+                        work.append((succ, self._successors(succ)))
+                        break
+                    if succ in on_stack:
+                        lowlink[node] = min(lowlink[node], index[succ])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+                    if lowlink[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            self.component_of[member] = len(self.components)
+                            component.append(member)
+                            if member == node:
+                                break
+                        self.components.append(component)
+
+        self._component_succ: List[Set[int]] = [set() for _ in self.components]
+        self._component_pred: List[Set[int]] = [set() for _ in self.components]
+        self._cyclic: List[bool] = [len(c) > 1 for c in self.components]
+        for node in self.edges:
+            c = self.component_of[node]
+            for succ in self._successors(node):
+                d = self.component_of[succ]
+                if c == d:
+                    self._cyclic[c] = True
+                else:
+                    self._component_succ[c].add(d)
+                    self._component_pred[d].add(c)
+
+    def cycles(self) -> List[List[Path]]:
+        """Return each include cycle as a sorted list of the files involved."""
+        return [sorted(c) for i, c in enumerate(self.components) if self._cyclic[i]]
+
+    def _reach(self, start: int, succ: List[Set[int]], memo: Dict[int, frozenset]) -> frozenset:
+        """Memoized reachability over the acyclic component graph."""
+        work = [(start, False)]
+        while work:
+            c, expanded = work.pop()
+            if c in memo:
+                continue
+            if expanded:
+                reached: Set[Path] = set(self.components[c]) if self._cyclic[c] else set()
+                for d in succ[c]:
+                    reached.update(self.components[d])
+                    reached |= memo[d]
+                memo[c] = frozenset(reached)
+            else:
+                work.append((c, True))
+                work.extend((d, False) for d in succ[c] if d not in memo)
+        return memo[start]
+
+    def descendants(self, path: Path) -> frozenset:
+        """Return every file transitively included by path."""
+        if path not in self.component_of:
+            return frozenset()
+        return self._reach(self.component_of[path], self._component_succ, self._descendants)
+
+    def ancestors(self, path: Path) -> frozenset:
+        """Return every file that transitively includes path."""
+        if path not in self.component_of:
+            return frozenset()
+        return self._reach(self.component_of[path], self._component_pred, self._ancestors)
+
+    def masters_including(self, path: Path) -> List[Path]:
+        """Return the master.adoc files that pull in path, directly or not."""
+        return sorted(p for p in self.ancestors(path) if p.name == MASTER_FILENAME)
+
+
+def build_include_graph(corpus: Corpus) -> IncludeGraph:
+    """Build the include graph for a corpus using its document attributes."""
+    return IncludeGraph(corpus, AttributeResolver(corpus.base_dir))
+
+
+def structure_events(entry: CorpusFile) -> List[Tuple[int, tuple]]:
+    """
+    Return (line, event) for the conditionals, attribute entries and
+    include directives of a file, in the order a VariantWalker meets them.
+    These decide what every variant includes and which attributes apply.
+    """
+    events = [(line, 1, (kind, name, value)) for line, kind, name, value in entry.references
+              if kind in STRUCTURE_KINDS]
+    events.extend((include.line_number, 0, ('include', include.target, include.options))
+                  for include in entry.includes)
+    events.sort(key=lambda event: event[:2])
+    return [(line, event) for line, _, event in events]
+
+
+def same_structure(old: Optional[CorpusFile], new: Optional[CorpusFile]) -> bool:
+    """Return True if two parses of a file differ in nothing a variant walk depends on but line numbers."""
+    if old is None or new is None:
+        return False
+    return [event for _, event in structure_events(old)] == [event for _, event in structure_events(new)]
+
+
+@dataclass
+class Variant:
+    """
+    A build variant: attributes set (or, with a None value, unset) as if
+    passed to Asciidoctor with -a, so entries in the documents cannot
+    change them.
+    """
+    name: str
+    attributes: Dict[str, Optional[str]] = field(default_factory=dict)
+
+
+DEFAULT_VARIANT = Variant('default')
+
+
+def parse_variant(values: List[str]) -> Variant:
+    """Build a variant from --attribute values: name, name=value, name! or !name."""
+    attributes: Dict[str, Optional[str]] = {}
+    for value in values:
+        name, _, text = value.partition('=')
+        name = name.strip()
+        if name.startswith('!') or name.endswith('!'):
+            attributes[name.strip('!')] = None
+        else:
+            attributes[name] = text
+    return Variant(','.join(values), attributes)
+
+
+def declared_variants(resolver: AttributeResolver) -> List[Variant]:
+    """
+    Return one variant per attribute the attribute definition files branch
+    on with ifdef::name[] blocks, such as mta and mtr. Each variant sets its
+    own attribute and unsets the others.
+    """
+    names: List[str] = []
+    for line in resolver._read_lines(resolver.base_dir / DEFAULT_ATTRIBUTES_FILE):
+        conditional = CONDITIONAL_RE.match(line)
+        if conditional and conditional.group(1) == 'ifdef' and not conditional.group(3):
+            for name in re.split(r'[,+]', conditional.group(2)):
+                if name and name not in names:
+                    names.append(name)
+    return [Variant(name, {other: ('' if other == name else None) for other in names}) for name in names]
+
+
+def select_variants(graph: IncludeGraph, attributes: Optional[List[str]] = None,
+                    all_variants: bool = False) -> Optional[List[Variant]]:
+    """
+    Return the variant defined by attribute arguments (name, name=value,
+    name! or !name), or every declared variant, or None for neither.
+    """
+    if attributes:
+        return [parse_variant(attributes)]
+    if all_variants:
+        return declared_variants(graph.resolver)
+    return None
+
+
+class VariantWalker:
+    """
+    Evaluates conditionals for several build variants in a single walk.
+
+    Files are walked in document order from each root through the include
+    graph, using the conditionals and attribute entries recorded in the
+    corpus. Every variant keeps its own attribute table, and each event is
+    tagged with the bitmask of the variants in which it is active, so the
+    unconditional parts of the tree are walked once for all variants and
+    only the branches of conditionals split them. The result is the mask
+    of every include edge, which gives one include graph per variant.
+    """
+
+    def __init__(self, graph: IncludeGraph, variants: List[Variant]):
+        self.graph = graph
+        self.corpus = graph.corpus
+        self.variants = variants
+        self.all_variants = (1 << len(variants)) - 1
+        self.edge_masks: Dict[Tuple[Path, int], int] = defaultdict(int)
+        self.file_masks: Dict[Path, int] = defaultdict(int)
+        self._events: Dict[Path, list] = {}
+
+    def _file_events(self, path: Path) -> list:
+        """Merge a file's reference events with its include edges, in line order."""
+        if path not in self._events:
+            entry = self.corpus.get(path)
+            events = [(line, 1, kind, name, value) for line, kind, name, value in entry.references]
+            events.extend((edge.directive.line_number, 0, 'include', edge, None)
+                          for edge in self.graph.includes_of(path))
+            events.sort(key=lambda event: event[:2])
+            self._events[path] = events
+        return self._events[path]
+
+    def bits(self, mask: int) -> Iterator[int]:
+        """Yield the indexes of the variants in a mask."""
+        return (i for i in range(len(self.variants)) if mask >> i & 1)
+
+    def names(self, mask: int) -> List[str]:
+        return [self.variants[i].name for i in self.bits(mask)]
+
+    def edge_mask(self, edge: IncludeEdge) -> int:
+        """Return the variants in which an include is processed."""
+        return self.edge_masks.get((edge.source, edge.directive.line_number), 0)
+
+    def forget_events(self, path: Path) -> None:
+        """Re-read a changed file's events and include edges on next use."""
+        self._events.pop(path, None)
+
+    def update_file(self, path: Path, old_entry: CorpusFile) -> None:
+        """
+        Take a file's new parse into account without walking again, when
+        same_structure() holds for its old and new parse: the events are
+        re-read on next use and include masks move to the new line numbers.
+        """
+        self.forget_events(path)
+        moves = [(old_line, new_line) for (old_line, event), (new_line, _)
+                 in zip(structure_events(old_entry), structure_events(self.corpus.files[path]))
+                 if event[0] == 'include']
+        masks = [self.edge_masks.pop((path, old_line), 0) for old_line, _ in moves]
+        for (_, new_line), mask in zip(moves, masks):
+            if mask:
+                self.edge_masks[(path, new_line)] = mask
+
+    def walk_all(self) -> 'VariantWalker':
+        """Walk every master.adoc, then every docs file no master reaches."""
+        for master in find_master_files(self.corpus).values():
+            self.walk(master)
+        for entry in list(self.corpus.docs_files()):
+            if entry.path not in self.file_masks and entry.readable:
+                self.walk(entry.path)
+        return self
+
+    def walk(self, root: Path, on_event: Optional[Callable] = None) -> None:
+        """
+        Walk one root for all variants. on_event(kind, name, path, line,
+        mask, tables) is called for every active ID and xref.
+        """
+        tables = [{name: value for name, value in variant.attributes.items() if value is not None}
+                  for variant in self.variants]
+        self._walk(root, self.all_variants, tables, [root], on_event)
+
+    def _set(self, mask: int, tables: List[Dict[str, str]], name: str, value: Optional[str]) -> None:
+        for i in self.bits(mask):
+            if name in self.variants[i].attributes:
+                continue  # Locked by the variant
+            if value is None:
+                tables[i].pop(name, None)
+            else:
+                tables[i][name] = expand_attributes(value, tables[i])
+
+    def _walk(self, path: Path, mask: int, tables: List[Dict[str, str]], stack: List[Path],
+              on_event: Optional[Callable]) -> None:
+        self.file_masks[path] |= mask
+        current = mask
+        enclosing: List[int] = []
+        for line, _, kind, name, value in self._file_events(path):
+            if kind == 'endif':
+                if enclosing:
+                    current = enclosing.pop()
+                continue
+            if kind in ('ifdef', 'ifndef', 'ifeval'):
+                condition = 0
+                for i in self.bits(current):
+                    if evaluate_ifdef(kind, name, tables[i], value) is not False:
+                        condition |= 1 << i
+                if kind == 'ifeval' or not value:
+                    enclosing.append(current)
+                    current &= condition
+                elif condition:
+                    # Single-line form: ifdef::name[:attribute: value]
+                    definition = ATTRIBUTE_DEF_RE.match(value)
+                    if definition:
+                        unset_before, attribute, unset_after, text = definition.groups()
+                        self._set(condition, tables, attribute,
+                                  None if unset_before or unset_after else text)
+                continue
+            if not current:
+                continue
+            if kind == REF_SET:
+                self._set(current, tables, name, value)
+            elif kind == REF_UNSET:
+                self._set(current, tables, name, None)
+            elif kind == 'include':
+                edge = name
+                self.edge_masks[(path, line)] |= current
+                targets: Dict[Optional[Path], int] = defaultdict(int)
+                if '{' in edge.directive.target:
+                    entry = self.corpus.files[path]
+                    for i in self.bits(current):
+                        expanded = expand_attributes(edge.directive.target.strip(), tables[i])
+                        target = None if '://' in expanded else Path(
+                            os.path.realpath(entry.logical_path.parent / expanded))
+                        targets[target] |= 1 << i
+                else:
+                    targets[edge.target] = current
+                for target, sub_mask in targets.items():
+                    if target is not None and target in self.corpus and target not in stack:
+                        stack.append(target)
+                        self._walk(target, sub_mask, tables, stack, on_event)
+                        stack.pop()
+            elif on_event is not None:
+                on_event(kind, name, path, line, current, tables)
+
+
+def find_snippet_usage(base_dir: Path, snippets: List[Path], corpus: Optional[Corpus] = None,
+                       graph: Optional[IncludeGraph] = None,
+                       walker: Optional[VariantWalker] = None) -> Dict[Path, List[Tuple[Path, str, int]]]:
+    """
+    Find where each snippet is used (included) in the documentation.
+    
+    Includes are matched by resolved path through the include graph, so
+    snippets that share a file name are kept apart.
+    
+    Returns a dict mapping snippet path to list of (including_file, include_line, line_number) tuples.
+    """
+    if corpus is None:
+        corpus = scan_corpus(base_dir)
+    if graph is None:
+        graph = build_include_graph(corpus)
+
+    snippet_set = set(snippets)
+    return {snippet: snippet_usage(corpus, graph, snippet, snippet_set, walker) for snippet in snippets}
+
+
+def snippet_usage(corpus: Corpus, graph: IncludeGraph, snippet: Path, snippet_set: Set[Path],
+                  walker: Optional[VariantWalker] = None) -> List[Tuple[Path, str, int]]:
+    """
+    Return the (including_file, include_line, line_number) uses of one snippet.
+
+    With a walker, includes inside conditionals that no variant processes
+    are not uses.
+    """
+    uses = []
+    for edge in graph.included_by(snippet):
+        entry = corpus.get(edge.source)
+        # Skip snippet files themselves
+        if entry is None or not entry.in_docs_tree or edge.source in snippet_set:
+            continue
+        if walker is not None and not walker.edge_mask(edge):
+            continue
+        uses.append((edge.source, edge.directive.text, edge.directive.line_number))
+    return uses
+
+
+def find_affected_masters(graph: IncludeGraph, changed: List[Path],
+                          walker: Optional[VariantWalker] = None) -> Tuple[Dict[Path, List[Path]], List[Path]]:
+    """
+    Find the master.adoc files that must be rebuilt after files changed.
+
+    Each changed file is followed up the reverse include graph to the
+    masters that pull it in. Deleted files are still targets of the
+    includes that point at them. A file directly in docs/<guide>/, such
+    as master-docinfo.xml, affects that guide. With a walker, includes
+    that no variant processes are not followed.
+
+    Returns ({master: changed files that reach it}, changed files that
+    reach no master).
+    """
+    docs_dir = graph.corpus.base_dir / DEFAULT_DOCS_DIR
+    masters = find_master_files(graph.corpus)
+    master_set = set(masters.values())
+    affected: Dict[Path, List[Path]] = defaultdict(list)
+    unreferenced: List[Path] = []
+
+    for path in changed:
+        reached: Set[Path] = set()
+        if path.parent.parent == docs_dir and path.parent.name in masters:
+            reached.add(masters[path.parent.name])
+        seen = {path}
+        queue = [path]
+        while queue:
+            current = queue.pop()
+            if current in master_set:
+                reached.add(current)
+            for edge in graph.included_by(current):
+                if walker is not None and not walker.edge_mask(edge):
+                    continue
+                if edge.source not in seen:
+                    seen.add(edge.source)
+                    queue.append(edge.source)
+        if not reached:
+            unreferenced.append(path)
+        for master in reached:
+            affected[master].append(path)
+
+    return dict(sorted(affected.items())), unreferenced
+
+
+def find_master_files(corpus: Corpus) -> Dict[str, Path]:
+    """Return {guide name: master.adoc path} for every docs/<guide>/master.adoc."""
+    docs_dir = corpus.base_dir / DEFAULT_DOCS_DIR
+    masters: Dict[str, Path] = {}
+    for entry in corpus.docs_files():
+        logical = entry.logical_path
+        if logical.name == MASTER_FILENAME and logical.parent.parent == docs_dir:
+            masters.setdefault(logical.parent.name, entry.path)
+    return dict(sorted(masters.items()))
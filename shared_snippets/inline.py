@@ -0,0 +1,321 @@
+"""
+Inlining snippets into the files that include them, with leveloffset-aware
+heading rewriting.
+"""
+import logging
+
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .common import (
+    ATTRIBUTE_DEF_RE, INCLUDE_OPTION_RE, INCLUDE_RE, LINE_TEXT, LINE_TITLE, PROFILER,
+    SECTION_TITLE_RE, SNIPPET_HEADER_PATTERNS, read_text, write_file_atomic,
+)
+from .corpus import BlockTokenizer, extract_includes
+from .graph import IncludeGraph
+from .transaction import Transaction
+
+log = logging.getLogger(__name__)
+
+
+def read_snippet_content(snippet_path: Path, strip_headers: bool = True) -> str:
+    """
+    Read snippet file content, optionally stripping metadata headers.
+    
+    Args:
+        snippet_path: Path to the snippet file
+        strip_headers: If True, remove content-type headers and snippet comments
+    """
+    content = read_text(snippet_path)
+    
+    if strip_headers:
+        # Remove content-type headers
+        for pattern in SNIPPET_HEADER_PATTERNS:
+            content = pattern.sub('', content)
+    
+    # Strip leading/trailing whitespace but preserve internal formatting
+    return content.strip()
+
+
+def parse_include_options(options: str) -> Dict[str, str]:
+    """Parse include:: attributes such as leveloffset=+1,tags="a;b" into a dict."""
+    return {name: value.strip().strip('"') for name, value in INCLUDE_OPTION_RE.findall(options)}
+
+
+def resolve_leveloffset(current: int, value: str) -> int:
+    """Apply a leveloffset value: +N and -N are relative to current, N is absolute."""
+    value = value.strip()
+    try:
+        if value.startswith(('+', '-')):
+            return current + int(value)
+        return int(value)
+    except ValueError:
+        log.warning(f"Ignoring invalid leveloffset: {value}")
+        return current
+
+
+def is_absolute_leveloffset(value: Optional[str]) -> bool:
+    """Check if a leveloffset value is an absolute N rather than +N or -N."""
+    return value is not None and value.strip().isdigit()
+
+
+def leveloffset_at(lines: List[str], line_number: int, inherited: int) -> int:
+    """
+    Return the leveloffset in effect at line_number of a file processed
+    with the inherited offset, applying the :leveloffset: entries before
+    it the way Flattener does.
+    """
+    offset = inherited
+    tokenizer = BlockTokenizer()
+    for line in lines[:line_number - 1]:
+        if tokenizer.classify(line) != LINE_TEXT or not line.startswith(':'):
+            continue
+        match = ATTRIBUTE_DEF_RE.match(line)
+        if match and match.group(2) == 'leveloffset':
+            if match.group(1) or match.group(3):
+                offset = inherited
+            else:
+                offset = resolve_leveloffset(offset, match.group(4))
+    return offset
+
+
+def inherited_leveloffsets(graph: IncludeGraph, path: Path,
+                           memo: Optional[Dict[Path, Set[int]]] = None,
+                           stack: Optional[Set[Path]] = None) -> Set[int]:
+    """
+    Return every leveloffset path is processed with, over all the include
+    chains that reach it. A file that nothing includes is a document of its
+    own, processed with 0. Includes that close a cycle are not followed.
+    """
+    memo = {} if memo is None else memo
+    stack = set() if stack is None else stack
+    if path in memo:
+        return memo[path]
+    edges = graph.included_by(path)
+    if not edges:
+        return {0}
+    stack.add(path)
+    offsets: Set[int] = set()
+    for edge in edges:
+        if edge.source in stack:
+            continue
+        parents = inherited_leveloffsets(graph, edge.source, memo, stack)
+        lines = read_text(edge.source).split('\n') if parents else []
+        value = parse_include_options(edge.directive.options).get('leveloffset')
+        for parent in parents:
+            offset = leveloffset_at(lines, edge.directive.line_number, parent)
+            offsets.add(offset if value is None else resolve_leveloffset(offset, value))
+    stack.discard(path)
+    memo[path] = offsets
+    return offsets
+
+
+def shift_section_title(line: str, offset: int) -> str:
+    """Shift a section title line by offset levels, never above the document title."""
+    match = SECTION_TITLE_RE.match(line)
+    if not match or offset == 0:
+        return line
+    level = max(1, len(match.group(1)) + offset)
+    return '=' * level + match.group(2)
+
+
+def tokenize_adoc_lines(lines: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """Yield (kind, line) for each line; see BlockTokenizer for the kinds."""
+    tokenizer = BlockTokenizer()
+    for line in lines:
+        yield tokenizer.classify(line), line
+
+
+def adjust_heading_levels(content: str, offset: int) -> str:
+    """
+    Shift the section titles in content by offset levels (negative to promote).
+
+    Only real titles move: lines inside listing, literal, passthrough and
+    comment blocks, comments and block delimiters such as ==== are left
+    as they are.
+    """
+    if offset == 0:
+        return content
+    return '\n'.join(
+        shift_section_title(line, offset) if kind == LINE_TITLE else line
+        for kind, line in tokenize_adoc_lines(content.split('\n'))
+    )
+
+
+def apply_leveloffset(snippet_content: str, options: str, current: int = 0) -> str:
+    """
+    Adjust snippet heading levels for the leveloffset in include options.
+
+    current is the leveloffset in effect at the include line. Once inlined,
+    the snippet's titles are processed with that offset, so +N and -N shift
+    them by N levels and an absolute N by N - current.
+    """
+    value = parse_include_options(options).get('leveloffset')
+    if value is None:
+        return snippet_content
+    return adjust_heading_levels(snippet_content, resolve_leveloffset(current, value) - current)
+
+
+def replace_include_lines(content: str, replacements: Dict[int, Tuple[Path, str, str, int]],
+                          source: Path) -> Tuple[str, List[Path]]:
+    """
+    Replace the include directive on each line number in `replacements`
+    by its snippet content, in one pass over content. A line that no
+    longer holds the expected directive is left alone with a warning.
+
+    Returns the new content and the snippets replaced, in line order.
+    """
+    lines = content.splitlines(keepends=True)
+    replaced: List[Path] = []
+    for line_number in sorted(replacements):
+        snippet, include_text, snippet_content, current = replacements[line_number]
+        line = lines[line_number - 1] if line_number <= len(lines) else ''
+        match = INCLUDE_RE.match(line)
+        if not match or match.group(0) != include_text:
+            log.warning(f"{source}:{line_number} no longer includes {snippet.name}; "
+                        f"skipping it (rescan and retry)")
+            continue
+        lines[line_number - 1] = apply_leveloffset(snippet_content, match.group(2), current) + line[match.end():]
+        if snippet not in replaced:
+            replaced.append(snippet)
+    return ''.join(lines), replaced
+
+
+def inline_snippets_in_file(including_file: Path, replacements: Dict[int, Tuple[Path, str, str, int]],
+                            dry_run: bool = False,
+                            transaction: Optional[Transaction] = None) -> List[Path]:
+    """
+    Replace the include directives for several snippets in one pass.
+
+    The including file is read once, the include directive on each line
+    number in `replacements` is replaced by the content of its snippet,
+    and the result is written once, atomically. Includes are identified by
+    line, as found in the resolved include graph, rather than by target
+    file name, so snippets that share a file name are never confused.
+    A line that no longer holds the expected directive is left alone.
+
+    Args:
+        including_file: File containing the include directives
+        replacements: Mapping of include line number to (snippet path,
+            include directive text, content to inline, leveloffset in
+            effect at the include)
+        dry_run: If True, only report what would be replaced
+        transaction: If given, stage the rewrite in it instead of writing
+
+    Returns the snippets that were replaced, in line order.
+    """
+    try:
+        content = read_text(including_file)
+    except Exception as e:
+        log.error(f"Could not read {including_file}: {e}")
+        return []
+    
+    with PROFILER.timer('regex'):
+        new_content, replaced = replace_include_lines(content, replacements, including_file)
+    
+    if not replaced:
+        return []
+    
+    if transaction is not None and not dry_run:
+        transaction.write(including_file, new_content)
+    elif not dry_run:
+        try:
+            write_file_atomic(including_file, new_content)
+        except OSError as e:
+            log.error(f"Could not write {including_file}: {e}")
+            return []
+    
+    for snippet in replaced:
+        if dry_run:
+            log.info(f"Would inline {snippet.name} in {including_file}")
+        else:
+            log.info(f"Inlined {snippet.name} in {including_file}")
+    return replaced
+
+
+def include_leveloffset(graph: Optional[IncludeGraph], including_file: Path, line_number: int,
+                        memo: Dict[Path, Set[int]]) -> Optional[int]:
+    """
+    Return the leveloffset in effect at an include line, or None if it
+    differs between the include chains that reach the file or there is
+    no graph to follow them.
+    """
+    if graph is None:
+        return None
+    inherited = inherited_leveloffsets(graph, including_file, memo)
+    lines = read_text(including_file).split('\n')
+    offsets = {leveloffset_at(lines, line_number, offset) for offset in inherited}
+    return offsets.pop() if len(offsets) == 1 else None
+
+
+def build_inline_plan(snippets: List[Path], usage: Dict[Path, List[Tuple[Path, str, int]]],
+                      strip_headers: bool = True, graph: Optional[IncludeGraph] = None
+                      ) -> Dict[Path, Dict[int, Tuple[Path, str, str, int]]]:
+    """
+    Group replacements by including file so each file is rewritten once.
+
+    usage is find_snippet_usage() output, whose uses come from the resolved
+    include graph. Returns a mapping of including file to {include line
+    number: (snippet path, include directive text, content, leveloffset in
+    effect at the include)}.
+
+    An absolute leveloffset=N depends on the offset the including file is
+    itself processed with, which is followed through graph. Includes where
+    that offset is not the same for every chain, or where no graph is
+    given, are left out of the plan with a warning.
+    """
+    plan: Dict[Path, Dict[int, Tuple[Path, str, str, int]]] = {}
+    memo: Dict[Path, Set[int]] = {}
+    for snippet in snippets:
+        uses = usage[snippet]
+        if not uses:
+            continue
+            
+        snippet_content = read_snippet_content(snippet, strip_headers=strip_headers)
+        
+        for including_file, include_text, line_number in uses:
+            current = 0
+            match = INCLUDE_RE.match(include_text)
+            if match and is_absolute_leveloffset(parse_include_options(match.group(2)).get('leveloffset')):
+                current = include_leveloffset(graph, including_file, line_number, memo)
+                if current is None:
+                    log.warning(f"{including_file}:{line_number}: not inlining {snippet.name}: "
+                                f"its absolute leveloffset depends on how the file is included")
+                    continue
+            plan.setdefault(including_file, {})[line_number] = (snippet, include_text, snippet_content, current)
+    return plan
+
+
+def apply_inline_plan(plan: Dict[Path, Dict[int, Tuple[Path, str, str, int]]], dry_run: bool = False,
+                      transaction: Optional[Transaction] = None) -> int:
+    """Apply (or stage) an inline plan, returning the number of replaced includes."""
+    replaced_count = 0
+    for including_file, replacements in plan.items():
+        replaced_count += len(inline_snippets_in_file(including_file, replacements, dry_run, transaction))
+    return replaced_count
+
+
+def inline_snippet(including_file: Path, snippet_path: Path, snippet_content: str,
+                   dry_run: bool = False) -> bool:
+    """
+    Replace an include directive with the actual snippet content.
+    
+    Only includes whose target resolves, relative to the including file,
+    to snippet_path are replaced. The including file is taken to be a
+    document of its own, so an absolute leveloffset is resolved against
+    its :leveloffset: entries alone. Returns True if replacement was made.
+    """
+    snippet_path = snippet_path.resolve()
+    try:
+        content = read_text(including_file)
+    except Exception as e:
+        log.error(f"Could not read {including_file}: {e}")
+        return False
+    lines = content.split('\n')
+    replacements = {
+        include.line_number: (snippet_path, include.text, snippet_content,
+                              leveloffset_at(lines, include.line_number, 0))
+        for include in extract_includes(content)
+        if (including_file.parent / include.target.strip()).resolve() == snippet_path
+    }
+    return bool(inline_snippets_in_file(including_file, replacements, dry_run))
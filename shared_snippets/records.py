@@ -0,0 +1,82 @@
+"""
+Machine-readable output records for the json and ndjson formats.
+"""
+
+import json
+import sys
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from .common import display_path
+from .corpus import Corpus, CorpusFile
+from .graph import IncludeGraph, VariantWalker, snippet_usage
+
+
+class RecordWriter:
+    """
+    Writes machine-readable output records.
+
+    With ndjson every record is written and flushed as one line as soon as
+    it is produced; with json the records are collected and written as a
+    single array when the writer is closed.
+    """
+
+    def __init__(self, output_format: str, stream=None):
+        self.output_format = output_format
+        self.stream = stream if stream is not None else sys.stdout
+        self.records: List[dict] = []
+
+    def write(self, record: dict) -> None:
+        if self.output_format == 'ndjson':
+            self.stream.write(json.dumps(record) + '\n')
+            self.stream.flush()
+        else:
+            self.records.append(record)
+
+    def close(self) -> None:
+        if self.output_format == 'json':
+            json.dump(self.records, self.stream, indent=2)
+            self.stream.write('\n')
+
+
+def snippet_record(entry: CorpusFile, base_dir: Path) -> dict:
+    """Return the output record describing one snippet file."""
+    return {
+        'type': 'snippet',
+        'path': str(display_path(entry.path, base_dir)),
+        'identified_by': entry.snippet_reasons,
+    }
+
+
+def iter_list_records(corpus: Corpus, snippets: List[Path], graph: Optional[IncludeGraph],
+                      show_masters: bool = False,
+                      walker: Optional[VariantWalker] = None) -> Iterator[dict]:
+    """Yield the snippet records for list, each followed by its usage and guides."""
+    base_dir = corpus.base_dir
+    snippet_set = set(snippets)
+    for snippet in snippets:
+        yield snippet_record(corpus.files[snippet], base_dir)
+        if graph is None:
+            continue
+        rel_snippet = str(display_path(snippet, base_dir))
+        for including_file, include_line, line_num in snippet_usage(corpus, graph, snippet,
+                                                                    snippet_set, walker):
+            record = {
+                'type': 'usage',
+                'snippet': rel_snippet,
+                'path': str(display_path(including_file, base_dir)),
+                'line': line_num,
+                'include': include_line,
+                'aliases': [str(display_path(alias, base_dir))
+                            for alias in corpus.logical_paths(including_file)],
+            }
+            if walker is not None:
+                record['variants'] = walker.names(walker.edge_masks[(including_file, line_num)])
+            yield record
+        if show_masters:
+            for master in graph.masters_including(snippet):
+                yield {
+                    'type': 'master',
+                    'snippet': rel_snippet,
+                    'path': str(display_path(master, base_dir)),
+                }
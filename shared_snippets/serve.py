@@ -0,0 +1,205 @@
+"""
+Query service answering JSON requests over a Unix domain socket.
+"""
+
+import json
+import logging
+import os
+import selectors
+import socket
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from .api import DocCorpus
+from .common import display_path
+from .inline import read_snippet_content
+from .records import snippet_record
+
+log = logging.getLogger(__name__)
+
+
+class QueryService:
+    """
+    Answers JSON queries against a DocCorpus kept in memory.
+
+    Before each query, and whenever the server is idle, the DocCorpus is
+    refreshed, which re-parses and re-checks only the files changed on
+    disk, so answers always reflect the files without rescanning.
+    """
+
+    def __init__(self, docs: DocCorpus):
+        self.docs = docs
+        self.base_dir = docs.base_dir
+        self.handlers: Dict[str, Callable[[dict], object]] = {
+            'who-includes': self.who_includes,
+            'resolve-include': self.resolve_include,
+            'validate-file': self.validate_file,
+            'show': self.show,
+        }
+
+    def refresh(self) -> List[Path]:
+        """Apply the changes made on disk since the last refresh."""
+        start = time.perf_counter()
+        changed = self.docs.refresh()
+        if changed:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            names = ', '.join(str(display_path(path, self.base_dir)) for path in changed)
+            log.info(f"Updated {names} ({elapsed_ms:.0f} ms)")
+        return changed
+
+    def answer(self, request: dict) -> dict:
+        """Answer one request; errors are returned in the response, never raised."""
+        query = request.get('query')
+        response = {'query': query}
+        if 'id' in request:
+            response['id'] = request['id']
+        handler = self.handlers.get(query) if isinstance(query, str) else None
+        if handler is None:
+            response.update(ok=False, error=f"Unknown query: {query!r}; "
+                                            f"expected one of {', '.join(self.handlers)}")
+            return response
+        try:
+            self.refresh()
+            response.update(ok=True, result=handler(request))
+        except (KeyError, ValueError) as e:
+            response.update(ok=False, error=str(e))
+        except Exception as e:
+            # One bad request must not take down the server and every editor using it
+            log.debug(f"Query {query} failed", exc_info=True)
+            response.update(ok=False, error=f"{type(e).__name__}: {e}")
+        return response
+
+    def _field(self, request: dict, name: str, kind: type, required: bool = True):
+        """Return a request field after checking its type; None if optional and absent."""
+        value = request.get(name)
+        if value is None or value == '':
+            if required:
+                raise ValueError(f"Missing {name!r}")
+            return None
+        # bool is a subclass of int but never a line number
+        if not isinstance(value, kind) or isinstance(value, bool):
+            raise ValueError(f"{name!r} must be {'a string' if kind is str else 'an integer'}")
+        return value
+
+    def _path(self, request: dict) -> str:
+        return self._field(request, 'path', str)
+
+    def _display(self, path: Optional[Path]) -> Optional[str]:
+        return str(display_path(path, self.base_dir)) if path is not None else None
+
+    def who_includes(self, request: dict) -> dict:
+        """The files that include a path directly, and the guides that pull it in."""
+        path = self._path(request)
+        masters, _ = self.docs.affected([path])
+        return {
+            'path': self._display(self.docs.path(path)),
+            'includers': [
+                {
+                    'path': self._display(edge.source),
+                    'line': edge.directive.line_number,
+                    'include': edge.directive.text,
+                }
+                for edge in self.docs.includers(path)
+            ],
+            'masters': [self._display(master) for master in masters],
+        }
+
+    def resolve_include(self, request: dict) -> dict:
+        """Where an include in a file points, per guide when the target uses attributes."""
+        line = self._field(request, 'line', int, required=False)
+        target = self._field(request, 'target', str, required=False)
+        if line is None and target is None:
+            raise ValueError("Give the 'line' of an include directive or a 'target'")
+        target, resolved = self.docs.resolve_include(self._path(request), line, target)
+        return {
+            'target': target,
+            'resolved': [
+                {
+                    'master': self._display(master),
+                    'path': self._display(path),
+                    'exists': path is not None and self.docs.exists(path),
+                }
+                for master, path in resolved
+            ],
+        }
+
+    def validate_file(self, request: dict) -> List[dict]:
+        """The current errors and warnings located in one file."""
+        return [issue.record() for issue in self.docs.issues(self._path(request))]
+
+    def show(self, request: dict) -> List[dict]:
+        """The snippets whose name contains the given text, with their content."""
+        name = self._field(request, 'snippet', str)
+        records = []
+        for snippet in self.docs.snippets():
+            if name in snippet.name:
+                record = snippet_record(self.docs.corpus.files[snippet], self.base_dir)
+                record['content'] = read_snippet_content(snippet, strip_headers=False)
+                records.append(record)
+        return records
+
+
+def serve_queries(service: QueryService, socket_path: Path, interval: float = 0.5) -> None:
+    """
+    Serve newline-delimited JSON requests on a Unix domain socket.
+
+    Each request line gets one response line. Connections may stay open
+    for any number of requests. When no request arrives for `interval`
+    seconds the tree is polled for changes, keeping the model warm.
+    """
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(socket_path))
+    os.chmod(socket_path, 0o600)
+    server.listen()
+    server.setblocking(False)
+    selector = selectors.DefaultSelector()
+    selector.register(server, selectors.EVENT_READ)
+    buffers: Dict[socket.socket, bytes] = {}
+    try:
+        while True:
+            events = selector.select(timeout=interval)
+            if not events:
+                try:
+                    service.refresh()
+                except Exception as e:
+                    log.error(f"Could not refresh: {e}")
+            for key, _ in events:
+                if key.fileobj is server:
+                    connection, _ = server.accept()
+                    connection.setblocking(True)
+                    selector.register(connection, selectors.EVENT_READ)
+                    buffers[connection] = b''
+                    continue
+                connection = key.fileobj
+                try:
+                    data = connection.recv(65536)
+                except OSError:
+                    data = b''
+                if not data:
+                    selector.unregister(connection)
+                    connection.close()
+                    del buffers[connection]
+                    continue
+                *lines, buffers[connection] = (buffers[connection] + data).split(b'\n')
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    try:
+                        request = json.loads(line)
+                        if not isinstance(request, dict):
+                            raise ValueError("Expected a JSON object")
+                    except ValueError as e:
+                        response = {'ok': False, 'error': f"Invalid request: {e}"}
+                    else:
+                        response = service.answer(request)
+                    try:
+                        connection.sendall(json.dumps(response).encode('utf-8') + b'\n')
+                    except OSError:
+                        break
+    finally:
+        for connection in buffers:
+            connection.close()
+        selector.close()
+        server.close()
+        socket_path.unlink(missing_ok=True)
@@ -0,0 +1,186 @@
+"""
+Journaled multi-file rewrites that can be rolled back.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from .common import JOURNAL_DIR, JOURNAL_FILE, PROFILER, file_digest, fsync_directory
+
+
+class Transaction:
+    """
+    A journaled set of file rewrites and deletions.
+
+    Nothing in the tree changes while operations are staged: new contents
+    are written and fsynced under .snippet-journal/<id>/staged/. commit()
+    keeps the original of every file in .snippet-journal/<id>/backup/
+    (a hard link where possible), records all operations in journal.json
+    with state "prepared", applies them with renames and then marks the
+    journal "committed". The journal of the last committed transaction is
+    kept so rollback() can restore the originals; a "prepared" journal
+    left behind by a crash is rolled back the same way.
+    """
+
+    def __init__(self, base_dir: Path, transaction_id: Optional[str] = None):
+        self.base_dir = base_dir
+        self.id = transaction_id or self.new_id()
+        self.root = base_dir / JOURNAL_DIR / self.id
+        self.operations: List[dict] = []
+        self.state = 'staging'
+
+    @staticmethod
+    def new_id() -> str:
+        """
+        Return an ID that sorts as a string in creation order: the local
+        time with zero-padded nanoseconds, then the process ID.
+        """
+        now = time.time_ns()
+        second = time.strftime('%Y%m%dT%H%M%S', time.localtime(now // 1_000_000_000))
+        return f"{second}.{now % 1_000_000_000:09d}-{os.getpid()}"
+
+    @classmethod
+    def latest(cls, base_dir: Path) -> Optional['Transaction']:
+        """Load the most recent transaction with a journal, if any."""
+        journal_root = base_dir / JOURNAL_DIR
+        if not journal_root.is_dir():
+            return None
+        for root in sorted(journal_root.iterdir(), reverse=True):
+            try:
+                with open(root / JOURNAL_FILE, encoding='utf-8') as f:
+                    journal = json.load(f)
+            except (OSError, ValueError):
+                continue
+            transaction = cls(base_dir, journal['id'])
+            transaction.operations = journal['operations']
+            transaction.state = journal['state']
+            return transaction
+        return None
+
+    def _path(self, *parts: str) -> Path:
+        path = self.root.joinpath(*parts)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def write(self, path: Path, content: str) -> None:
+        """Stage new content for path."""
+        data = content.encode('utf-8')
+        staged = self._path('staged', str(len(self.operations)))
+        with PROFILER.timer('write'):
+            with open(staged, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+        PROFILER.count_write(len(data))
+        self.operations.append({
+            'op': 'write',
+            'path': str(path),
+            'staged': staged.name,
+            'digest': hashlib.sha1(data).hexdigest(),
+        })
+
+    def delete(self, path: Path) -> None:
+        """Stage the deletion of path."""
+        self.operations.append({'op': 'delete', 'path': str(path)})
+
+    def discard(self) -> None:
+        """Drop everything staged so far; the tree has not been touched."""
+        shutil.rmtree(self.root, ignore_errors=True)
+        self.operations = []
+        self.state = 'discarded'
+
+    def _save(self, state: str) -> None:
+        self.state = state
+        journal = self._path(JOURNAL_FILE)
+        tmp = journal.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'id': self.id, 'state': state, 'operations': self.operations}, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, journal)
+        fsync_directory(self.root)
+
+    def commit(self) -> None:
+        """
+        Apply the staged operations.
+
+        If preparing fails, the transaction is discarded; if applying fails
+        partway, the operations already applied are rolled back. Either
+        way the error is re-raised.
+        """
+        try:
+            for index, operation in enumerate(self.operations):
+                path = Path(operation['path'])
+                operation['backup'] = str(index)
+                operation['original'] = file_digest(path)
+                if operation['op'] == 'write' and path.exists():
+                    backup = self._path('backup', str(index))
+                    try:
+                        os.link(path, backup)
+                    except OSError:
+                        shutil.copy2(path, backup)
+                    shutil.copymode(path, self.root / 'staged' / operation['staged'])
+            fsync_directory(self.root / 'backup')
+            self._save('prepared')
+        except BaseException:
+            self.discard()
+            raise
+
+        try:
+            with PROFILER.timer('write'):
+                for operation in self.operations:
+                    path = Path(operation['path'])
+                    if operation['op'] == 'write':
+                        os.replace(self.root / 'staged' / operation['staged'], path)
+                    else:
+                        os.replace(path, self._path('backup', operation['backup']))
+                    fsync_directory(path.parent)
+        except BaseException:
+            self.rollback()
+            raise
+        self._save('committed')
+        self._prune()
+
+    def _prune(self) -> None:
+        """Remove the journals of earlier transactions; only the last can be rolled back."""
+        for root in (self.base_dir / JOURNAL_DIR).iterdir():
+            if root.name != self.id:
+                shutil.rmtree(root, ignore_errors=True)
+
+    def modified_since_commit(self) -> List[Path]:
+        """Return files changed after the commit, which a rollback would clobber."""
+        modified = []
+        for operation in self.operations:
+            path = Path(operation['path'])
+            current = file_digest(path)
+            if operation['op'] == 'write':
+                expected = (operation['digest'], operation.get('original'))
+            else:
+                expected = (None, operation.get('original'))
+            if current not in expected:
+                modified.append(path)
+        return modified
+
+    def rollback(self) -> int:
+        """Restore every file touched by the transaction and discard its journal."""
+        restored = 0
+        for operation in reversed(self.operations):
+            if 'backup' not in operation:
+                continue
+            path = Path(operation['path'])
+            backup = self.root / 'backup' / operation['backup']
+            if backup.exists():
+                os.replace(backup, path)
+                restored += 1
+            elif operation['op'] == 'write' and operation.get('original') is None and path.exists():
+                path.unlink()
+                restored += 1
+            fsync_directory(path.parent)
+        shutil.rmtree(self.root, ignore_errors=True)
+        self.state = 'rolled-back'
+        return restored
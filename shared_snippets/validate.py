@@ -0,0 +1,451 @@
+"""
+Validation of snippet includes, include cycles, IDs, xrefs and images.
+"""
+
+import os
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .common import (
+    DEFAULT_IMAGES_DIR, MASTER_FILENAME, PROFILER, REF_ANCHOR, REF_IMAGE, REF_XREF,
+    display_path,
+)
+from .corpus import Corpus, CorpusFile, is_snippet_by_name
+from .graph import (
+    DEFAULT_VARIANT, IncludeGraph, Variant, VariantWalker, expand_attributes,
+    find_master_files, same_structure, snippet_usage,
+)
+
+
+class DirectoryListing:
+    """
+    File existence checks answered from directory listings.
+
+    Each directory is resolved and listed once, however many references
+    point into it, instead of calling stat() once per reference.
+    """
+
+    def __init__(self):
+        self._real_dirs: Dict[Path, Path] = {}
+        self._entries: Dict[Path, FrozenSet[str]] = {}
+
+    def _list(self, directory: Path) -> Tuple[Path, FrozenSet[str]]:
+        real_dir = self._real_dirs.get(directory)
+        if real_dir is None:
+            with PROFILER.timer('resolve'):
+                real_dir = self._real_dirs[directory] = Path(os.path.realpath(directory))
+        if real_dir not in self._entries:
+            try:
+                with PROFILER.timer('walk'):
+                    with os.scandir(real_dir) as entries:
+                        self._entries[real_dir] = frozenset(entry.name for entry in entries)
+            except OSError:
+                self._entries[real_dir] = frozenset()
+        return real_dir, self._entries[real_dir]
+
+    def find(self, path: Path) -> Optional[Path]:
+        """Return the resolved path of an existing file, or None if it is missing."""
+        real_dir, names = self._list(path.parent)
+        return real_dir / path.name if path.name in names else None
+
+    def files_under(self, directory: Path) -> Iterator[Path]:
+        """Yield the resolved path of every file below a directory, in sorted order, skipping dotfiles."""
+        real_dir, names = self._list(directory)
+        for name in sorted(names):
+            if name.startswith('.'):
+                continue
+            path = real_dir / name
+            if path.is_dir():
+                yield from self.files_under(path)
+            else:
+                yield path
+
+
+@dataclass
+class MasterReferences:
+    """The expanded IDs, xrefs and images of one guide in one variant, in document order."""
+    master: Path
+    anchors: Dict[str, List[Tuple[Path, int]]] = field(default_factory=lambda: defaultdict(list))
+    xrefs: List[Tuple[str, Path, int]] = field(default_factory=list)
+    # (target, resolved image or None if missing, path, line)
+    images: List[Tuple[str, Optional[Path], Path, int]] = field(default_factory=list)
+
+
+class ReferenceIndex:
+    """
+    Per-master index of block IDs, xrefs and images.
+
+    Each master.adoc is walked with a VariantWalker, using the reference
+    events stored in the corpus, so no file is read again. Attribute
+    entries and conditionals are applied as they are met, which gives IDs
+    such as foo_{context} the value they have at that point of that guide
+    in each variant. IDs are then looked up by hash. Images are resolved
+    against the imagesdir in effect where they appear, relative to the
+    directory of the master, and checked against a DirectoryListing.
+    """
+
+    def __init__(self, graph: IncludeGraph, variants: Optional[List[Variant]] = None,
+                 listing: Optional[DirectoryListing] = None):
+        self.graph = graph
+        self.corpus = graph.corpus
+        self.walker = VariantWalker(graph, variants or [DEFAULT_VARIANT])
+        self.listing = listing if listing is not None else DirectoryListing()
+        self._masters: Dict[Path, List[MasterReferences]] = {}
+
+    def forget(self, masters: Iterable[Path] = (), path: Optional[Path] = None) -> None:
+        """Drop what was found for some guides, and the events read from a changed file."""
+        for master in masters:
+            self._masters.pop(master, None)
+        if path is not None:
+            self.walker.forget_events(path)
+
+    def image_path(self, master: Path, target: str, imagesdir: Optional[str]) -> Optional[Path]:
+        """Return where a guide's image target points, or None for URLs."""
+        if '://' in target or target.startswith('data:'):
+            return None
+        if os.path.isabs(target):
+            return Path(target)
+        if imagesdir and '://' in imagesdir:
+            return None
+        return self.corpus.files[master].logical_path.parent / (imagesdir or '') / target
+
+    def for_master(self, master: Path) -> List[MasterReferences]:
+        """Return the IDs, xrefs and images of a guide per variant, walking it on first use."""
+        if master not in self._masters:
+            references = [MasterReferences(master) for _ in self.walker.variants]
+
+            def on_event(kind, name, path, line, mask, tables):
+                for i in self.walker.bits(mask):
+                    expanded = expand_attributes(name, tables[i])
+                    if kind == REF_ANCHOR:
+                        references[i].anchors[expanded].append((path, line))
+                    elif kind == REF_XREF:
+                        references[i].xrefs.append((expanded, path, line))
+                    elif kind == REF_IMAGE:
+                        image = self.image_path(master, expanded, tables[i].get('imagesdir'))
+                        if image is not None:
+                            references[i].images.append((expanded, self.listing.find(image), path, line))
+
+            self.walker.walk(master, on_event)
+            self._masters[master] = references
+        return self._masters[master]
+
+    def _variant_issues(self, references: MasterReferences) -> Iterator[Tuple[str, str, Path, int, str]]:
+        for anchor, locations in references.anchors.items():
+            if len(locations) > 1:
+                where = ', '.join(f"{display_path(path, self.corpus.base_dir)}:{line}"
+                                  for path, line in locations)
+                yield 'duplicate-id', anchor, locations[1][0], locations[1][1], where
+        for target, path, line in references.xrefs:
+            if target not in references.anchors:
+                yield 'dangling-xref', target, path, line, ''
+        for target, image, path, line in references.images:
+            if image is None:
+                yield 'broken-image', target, path, line, ''
+
+    def used_images(self, masters: Iterable[Path]) -> Set[Path]:
+        """Return the resolved images that the given guides show in any variant."""
+        used: Set[Path] = set()
+        for master in masters:
+            for references in self.for_master(master):
+                used.update(image for _, image, _, _ in references.images if image is not None)
+        return used
+
+    def issues(self, master: Path) -> Iterator['Issue']:
+        """Yield duplicate IDs, dangling xrefs and broken images of one guide, once across variants."""
+        base_dir = self.corpus.base_dir
+        rel_master = str(display_path(master, base_dir))
+        found: Dict[Tuple[str, str, Path, int, str], List[str]] = {}
+        for variant, references in zip(self.walker.variants, self.for_master(master)):
+            for key in self._variant_issues(references):
+                found.setdefault(key, []).append(variant.name)
+
+        for (kind, target, path, line, where), names in found.items():
+            rel_path = display_path(path, base_dir)
+            context = rel_master
+            if len(names) < len(self.walker.variants):
+                context += f", variants: {', '.join(names)}"
+            if kind == 'duplicate-id':
+                message = f"Duplicate ID {target} in {context}: {where}"
+            elif kind == 'broken-image':
+                message = f"Broken image in {rel_path}: {target} (in {context})"
+            else:
+                message = f"Dangling xref in {rel_path}: {target} (in {context})"
+            yield Issue(
+                severity='error',
+                kind=kind,
+                message=message,
+                path=str(rel_path),
+                line=line,
+                target=target,
+                master=rel_master,
+            )
+
+
+@dataclass(frozen=True)
+class Issue:
+    """A single validation finding."""
+    severity: str  # 'error' or 'warning'
+    kind: str      # 'broken-include', 'include-cycle', 'unused-snippet',
+                   # 'duplicate-id', 'dangling-xref', 'broken-image'
+                   # or 'orphaned-image'
+    message: str
+    path: Optional[str] = None
+    line: Optional[int] = None
+    target: Optional[str] = None
+    master: Optional[str] = None
+
+    def record(self) -> dict:
+        """Return the issue as a machine-readable output record."""
+        record = {'type': self.severity, 'kind': self.kind, 'message': self.message}
+        for key in ('path', 'line', 'target', 'master'):
+            value = getattr(self, key)
+            if value is not None:
+                record[key] = value
+        return record
+
+
+class Validator:
+    """
+    Validation findings kept per file, so they can be refreshed for just
+    the files affected by a change.
+
+    Errors are broken snippet includes (keyed by including file), include
+    cycles, and duplicate IDs, dangling xrefs and broken images (per
+    master.adoc); warnings are unused snippets (keyed by snippet) and
+    images under docs/topics/images that no guide shows.
+    """
+
+    def __init__(self, corpus: Corpus, graph: IncludeGraph, variants: Optional[List[Variant]] = None):
+        self.corpus = corpus
+        self.graph = graph
+        self.base_dir = corpus.base_dir
+        self.variants = variants
+        self.walker: Optional[VariantWalker] = None
+        self.refresh_variants()
+        self.file_errors: Dict[Path, List[Issue]] = {}
+        self.snippet_warnings: Dict[Path, Issue] = {}
+        self.cycle_errors: List[Issue] = []
+        self.reference_errors: Dict[Path, List[Issue]] = {}
+        self.image_warnings: List[Issue] = []
+        self.listing = DirectoryListing()
+        self.references: Optional[ReferenceIndex] = None
+
+    def refresh_variants(self) -> None:
+        """Re-evaluate conditionals per variant after the graph changed."""
+        if self.variants:
+            self.walker = VariantWalker(self.graph, self.variants).walk_all()
+
+    def update_file(self, path: Path, old_entry: Optional[CorpusFile]) -> bool:
+        """
+        Bring the variant walk and the reference index up to date after the
+        graph took in a change to one file. The variants are walked again
+        only if the file's conditionals, attribute entries or includes
+        changed other than by moving lines; returns True in that case.
+        """
+        changed = not same_structure(old_entry, self.corpus.get(path))
+        if changed:
+            self.refresh_variants()
+        elif self.walker is not None:
+            self.walker.update_file(path, old_entry)
+        if self.references is not None:
+            self.references.forget(path=path)
+        return changed
+
+    def check_all(self) -> None:
+        for _ in self.iter_check_all():
+            pass
+
+    def iter_check_all(self) -> Iterator[Issue]:
+        """Run every check, yielding each issue as soon as it is found."""
+        self.file_errors.clear()
+        self.snippet_warnings.clear()
+        for entry in self.corpus.docs_files():
+            self.check_file(entry.path)
+            yield from self.file_errors.get(entry.path, ())
+        snippets = self.corpus.snippets()
+        snippet_set = set(snippets)
+        for snippet in snippets:
+            self.check_snippet(snippet, snippet_set)
+            if snippet in self.snippet_warnings:
+                yield self.snippet_warnings[snippet]
+        self.check_cycles()
+        yield from self.cycle_errors
+        self.check_references()
+        for issues in self.reference_errors.values():
+            yield from issues
+        self.check_images()
+        yield from self.image_warnings
+
+    def iter_check_changed(self, changed: List[Path]) -> Iterator[Issue]:
+        """
+        Run the checks affected by a set of changed (or deleted) files.
+
+        Checks the changed files themselves, the snippets they include and
+        every file that includes a changed snippet, then reports the
+        include cycles that involve any of those files and the ID and
+        xref errors of every guide that pulls in a changed file.
+        """
+        snippet_set = set(self.corpus.snippets())
+        files: Set[Path] = set()
+        snippets: Set[Path] = set()
+        for path in changed:
+            if path in self.corpus:
+                files.add(path)
+                snippets.update(edge.target for edge in self.graph.includes_of(path)
+                                if edge.target in snippet_set)
+            if path in snippet_set or path not in self.corpus:
+                files.update(edge.source for edge in self.graph.included_by(path))
+            if path in snippet_set:
+                snippets.add(path)
+
+        for entry in self.corpus.docs_files():
+            if entry.path in files:
+                self.check_file(entry.path)
+                yield from self.file_errors.get(entry.path, ())
+        for snippet in sorted(snippets):
+            self.check_snippet(snippet, snippet_set)
+            if snippet in self.snippet_warnings:
+                yield self.snippet_warnings[snippet]
+        self.check_cycles()
+        for issue, cycle in zip(self.cycle_errors, self.graph.cycles()):
+            if files.intersection(cycle):
+                yield issue
+
+        masters: Set[Path] = set()
+        for path in files.union(changed):
+            masters.update(self.graph.masters_including(path))
+            if path.name == MASTER_FILENAME:
+                masters.add(path)
+        self.check_references(masters)
+        for master in sorted(masters):
+            yield from self.reference_errors.get(master, ())
+
+    def check_file(self, path: Path) -> None:
+        """Check the snippet includes of one file for missing targets."""
+        errors = []
+        entry = self.corpus.get(path)
+        if entry is not None and entry.in_docs_tree:
+            rel_filepath = display_path(path, self.base_dir)
+            for edge in self.graph.includes_of(path):
+                include_path = edge.directive.target
+                include_name = Path(include_path).name
+                
+                # Check if this looks like a snippet include
+                if not (is_snippet_by_name(include_name) or 'snippet' in include_path.lower()):
+                    continue
+                
+                # Includes that no variant processes cannot break a build
+                if self.walker is not None and not self.walker.edge_mask(edge):
+                    continue
+                
+                # Check if the file exists, per guide when the target uses attributes
+                for master, target in self.graph.resolve_for_masters(edge):
+                    if target is not None and target not in self.corpus and not target.exists():
+                        rel_master = display_path(master, self.base_dir) if master else None
+                        context = f" (in {rel_master})" if rel_master else ""
+                        errors.append(Issue(
+                            severity='error',
+                            kind='broken-include',
+                            message=f"Broken snippet include in {rel_filepath}: {include_path}{context}",
+                            path=str(rel_filepath),
+                            line=edge.directive.line_number,
+                            target=include_path,
+                            master=str(rel_master) if rel_master else None,
+                        ))
+        if errors:
+            self.file_errors[path] = errors
+        else:
+            self.file_errors.pop(path, None)
+
+    def check_snippet(self, path: Path, snippet_set: Optional[Set[Path]] = None) -> None:
+        """Check whether a snippet is still used anywhere, in every variant."""
+        if snippet_set is None:
+            snippet_set = set(self.corpus.snippets())
+        self.snippet_warnings.pop(path, None)
+        if path not in snippet_set:
+            return
+        rel_path = display_path(path, self.base_dir)
+        message = None
+        if not snippet_usage(self.corpus, self.graph, path, snippet_set, self.walker):
+            message = f"Unused snippet: {rel_path}"
+        elif self.walker is not None:
+            used = 0
+            for edge in self.graph.included_by(path):
+                if edge.source not in snippet_set:
+                    used |= self.walker.edge_mask(edge)
+            unused = self.walker.names(self.walker.all_variants & ~used)
+            if unused:
+                message = f"Unused snippet: {rel_path} (in variants: {', '.join(unused)})"
+        if message:
+            self.snippet_warnings[path] = Issue(
+                severity='warning',
+                kind='unused-snippet',
+                message=message,
+                path=str(rel_path),
+            )
+
+    def check_cycles(self) -> None:
+        self.cycle_errors = []
+        for cycle in self.graph.cycles():
+            members = ', '.join(str(display_path(path, self.base_dir)) for path in cycle)
+            self.cycle_errors.append(Issue(
+                severity='error',
+                kind='include-cycle',
+                message=f"Include cycle between: {members}",
+                path=str(display_path(cycle[0], self.base_dir)),
+            ))
+
+    def check_references(self, masters: Optional[Set[Path]] = None) -> None:
+        """
+        Check IDs, xrefs and images per guide, for every master.adoc or the
+        given ones. Checking only some guides keeps what the reference index
+        found for the others.
+        """
+        if masters is None or self.references is None:
+            self.references = ReferenceIndex(self.graph, self.variants, self.listing)
+        index = self.references
+        index.listing = self.listing
+        if masters is None:
+            self.reference_errors.clear()
+            masters = set(find_master_files(self.corpus).values())
+        index.forget(masters)
+        for master in sorted(masters):
+            issues = list(index.issues(master)) if master in self.corpus else []
+            if issues:
+                self.reference_errors[master] = issues
+            else:
+                self.reference_errors.pop(master, None)
+
+    def check_images(self) -> None:
+        """Check for images under docs/topics/images that no guide shows in any variant."""
+        if self.references is None:
+            self.references = ReferenceIndex(self.graph, self.variants, self.listing)
+        masters = [master for master in find_master_files(self.corpus).values() if master in self.corpus]
+        used = self.references.used_images(masters)
+        self.image_warnings = []
+        for image in self.listing.files_under(self.base_dir / DEFAULT_IMAGES_DIR):
+            if image not in used:
+                rel_path = display_path(image, self.base_dir)
+                self.image_warnings.append(Issue(
+                    severity='warning',
+                    kind='orphaned-image',
+                    message=f"Orphaned image: {rel_path}",
+                    path=str(rel_path),
+                ))
+
+    def errors(self) -> List[Issue]:
+        """Return all errors, in scan order followed by cycles and ID/xref errors."""
+        errors = []
+        for path in self.corpus.files:
+            errors.extend(self.file_errors.get(path, ()))
+        errors.extend(self.cycle_errors)
+        for master in sorted(self.reference_errors):
+            errors.extend(self.reference_errors[master])
+        return errors
+
+    def warnings(self) -> List[Issue]:
+        """Return all warnings: unused snippets, then orphaned images, each ordered by path."""
+        return [self.snippet_warnings[path] for path in sorted(self.snippet_warnings)] + self.image_warnings
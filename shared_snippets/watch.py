@@ -0,0 +1,145 @@
+"""
+Stat-polling change detection and incremental revalidation.
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from .common import DEFAULT_ASSEMBLIES_DIR, DEFAULT_DOCS_DIR, MASTER_FILENAME, REF_IMAGE, SKIP_DIRS
+from .corpus import Corpus, CorpusFile, TreeWalker, parse_adoc_file
+from .graph import AttributeResolver, IncludeGraph, is_attributes_file
+from .validate import DirectoryListing, Validator
+
+
+class TreeWatcher:
+    """
+    Detects changed, added and removed .adoc files by stat polling.
+
+    Every known file is stat()ed on each poll; directories are only
+    re-listed when their own mtime changes, which is when files are
+    added or removed in them. Files added between the scan and the
+    creation of the watcher are reported by the first poll.
+    """
+
+    def __init__(self, corpus: Corpus):
+        self.corpus = corpus
+        base_dir = corpus.base_dir
+        self.roots = [base_dir / DEFAULT_DOCS_DIR, base_dir / DEFAULT_ASSEMBLIES_DIR]
+        self.real_roots = [Path(os.path.realpath(root)) for root in self.roots if root.exists()]
+        walker = TreeWalker()
+        self.added: Set[Path] = set()
+        for root in self.roots:
+            if root.exists():
+                for _, resolved_path in walker.walk(root):
+                    if resolved_path not in corpus:
+                        self.added.add(resolved_path)
+        self.dir_mtimes: Dict[Path, int] = dict(walker.dir_mtimes)
+
+    def _remember_dir(self, directory: Path) -> None:
+        try:
+            self.dir_mtimes[directory] = os.stat(directory).st_mtime_ns
+        except OSError:
+            self.dir_mtimes.pop(directory, None)
+
+    def _in_docs_tree(self, path: Path) -> bool:
+        return any(root in path.parents for root in self.real_roots)
+
+    def _list_dir(self, directory: Path, found: Set[Path]) -> None:
+        """Collect unknown .adoc files in a directory, recursing into new subdirectories."""
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return
+        for dir_entry in entries:
+            if dir_entry.is_dir() and dir_entry.name not in SKIP_DIRS:
+                real = Path(os.path.realpath(dir_entry.path))
+                if real not in self.dir_mtimes:
+                    self._remember_dir(real)
+                    self._list_dir(real, found)
+            elif dir_entry.name.endswith('.adoc'):
+                real = Path(os.path.realpath(dir_entry.path))
+                if real not in self.corpus and self._in_docs_tree(real):
+                    found.add(real)
+
+    def poll(self) -> List[Path]:
+        """Return the resolved paths that changed, appeared or disappeared."""
+        changed: Set[Path] = self.added
+        self.added = set()
+        for path, entry in self.corpus.files.items():
+            if not entry.in_docs_tree:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                changed.add(path)
+                continue
+            if st.st_mtime_ns != entry.mtime_ns or st.st_size != entry.size:
+                changed.add(path)
+
+        for directory, mtime in list(self.dir_mtimes.items()):
+            try:
+                current = os.stat(directory).st_mtime_ns
+            except OSError:
+                del self.dir_mtimes[directory]
+                continue
+            if current != mtime:
+                self.dir_mtimes[directory] = current
+                self._list_dir(directory, changed)
+
+        return sorted(changed)
+
+
+def image_events(entry: Optional[CorpusFile]) -> List[str]:
+    """Return the image targets of a file in order, or an empty list for no file."""
+    if entry is None:
+        return []
+    return [name for _, kind, name, _ in entry.references if kind == REF_IMAGE]
+
+
+def apply_file_change(corpus: Corpus, graph: IncludeGraph, validator: Validator, path: Path) -> None:
+    """
+    Re-parse one changed file and re-check only what it can affect: the
+    file's own includes, the files that include it, and the snippets it
+    used to include or now includes.
+    """
+    old_entry = corpus.get(path)
+    old_masters = graph.masters_including(path)
+    was_snippet = old_entry is not None and old_entry.is_snippet
+    if path.exists():
+        logical_path = old_entry.logical_path if old_entry is not None else path
+        entry, _ = parse_adoc_file(logical_path, path, in_docs_tree=True)
+        corpus.files[path] = entry
+    else:
+        corpus.files.pop(path, None)
+    # Images may have been added or removed since the last check
+    validator.listing = DirectoryListing()
+
+    if is_attributes_file(path):
+        # Attribute tables feed every include target, so start over
+        graph.resolver = AttributeResolver(corpus.base_dir)
+        graph.__init__(corpus, graph.resolver)
+        validator.refresh_variants()
+        validator.check_all()
+        return
+
+    touched = graph.update_file(path)
+    structure_changed = validator.update_file(path, old_entry)
+    validator.check_file(path)
+    for edge in graph.included_by(path):
+        validator.check_file(edge.source)
+
+    snippet_set = set(corpus.snippets())
+    for snippet in touched | {path}:
+        if snippet in snippet_set or (snippet == path and was_snippet):
+            validator.check_snippet(snippet, snippet_set)
+    validator.check_cycles()
+
+    # Only the guides that pull the file in, before or after the change, can
+    # have different IDs, xrefs or images
+    masters = set(old_masters) | set(graph.masters_including(path))
+    if path.name == MASTER_FILENAME:
+        masters.add(path)
+    validator.check_references(masters)
+    if structure_changed or image_events(old_entry) != image_events(corpus.get(path)):
+        validator.check_images()